@@ -1,11 +1,19 @@
 
+import time
 from abc import ABC, abstractclassmethod
 
+from elements import Configuration
 from puzzle import WordlePuzzle
+from guess_cache import GuessCache
+import metrics
+
+# Words an OracleUI lets a puzzle enter before giving up on it
+ORACLE_MAX_STEPS = 50
 
 class UI(ABC):
     def __init__(self, wordle_object: WordlePuzzle):
         self.wordle_puzzle = wordle_object
+        self.first_word_time = None
 
     def __str__(self) -> str:
         return f"<{self.name} Object>\n {self.wordle_puzzle.__str__()}"
@@ -13,9 +21,12 @@ class UI(ABC):
     def solve(self):
         solution_generator = self.wordle_puzzle.solutionGenerator()
         next_word = next(solution_generator)
+        self.first_word_time = time.perf_counter()
         while next_word != "COMPLETED":
-            self.enterWordEntry(next_word)
-            config = self.obtainConfiguration()
+            with metrics.timer("UI.enterWordEntry"):
+                self.enterWordEntry(next_word)
+            with metrics.timer("UI.obtainConfiguration"):
+                config = self.obtainConfiguration()
             next_word = solution_generator.send(config)
 
     @abstractclassmethod
@@ -37,3 +48,62 @@ class TerminalUI(UI):
     def obtainConfiguration(self):
         return input("  Enter Configuration: ")
 
+class OracleUI(UI):
+    '''
+    Plays against known answers, one per game of the puzzle: the configuration of every word entered is computed
+    in-process with Configuration(mystery_word, my_word), without any I/O, so games run as fast as the solver does.
+    '''
+    def __init__(self, wordle_object: WordlePuzzle, mystery_words: list[str] = None):
+        super().__init__(wordle_object)
+        self.name = "OracleUI"
+        self.mystery_words = []
+        self.entered_words = []
+        if mystery_words != None:
+            self.setMysteryWords(mystery_words)
+
+    def __str__(self) -> str:
+        return f"{super().__str__()}\n Entered Words: {self.entered_words}"
+
+    def setMysteryWords(self, mystery_words: list[str]) -> None:
+        if isinstance(mystery_words, str):
+            mystery_words = [mystery_words]
+        if len(mystery_words) != self.wordle_puzzle.getPuzzleSize():
+            raise Exception(f"<{self.name}>: The puzzle needs {self.wordle_puzzle.getPuzzleSize()} mystery word(s)")
+        self.mystery_words = list(mystery_words)
+
+    def solve(self) -> list[str]:
+        '''Plays the puzzle to the end, and returns the words it entered.'''
+        if len(self.mystery_words) == 0:
+            raise Exception(f"<{self.name}>: No mystery words to play against")
+        self.entered_words = []
+        super().solve()
+        return self.entered_words
+
+    def enterWordEntry(self, my_word) -> None:
+        if len(self.entered_words) >= ORACLE_MAX_STEPS:
+            raise Exception(f"<{self.name}>: Puzzle did not finish within {ORACLE_MAX_STEPS} words")
+        self.entered_words.append(my_word)
+
+    def obtainConfiguration(self) -> str:
+        my_word = self.entered_words[-1]
+        return "".join( Configuration(mystery_word, my_word).get_config_string() for mystery_word in self.mystery_words )
+
+    def playGames(self, games: list[list[str]], remember_words: bool = True) -> list[list[str]]:
+        '''Plays a game against each set of mystery words in turn, resetting the same puzzle (and so reusing its
+        ConfigMap) between games, and returns the words entered in each. With 'remember_words', a puzzle without
+        a guess cache is given an in-memory one for the games, so that the words every game starts with are only
+        searched for once.'''
+        remembered = remember_words and self.wordle_puzzle.guess_cache is None
+        if remembered:
+            self.wordle_puzzle.guess_cache = GuessCache()
+        try:
+            entered_words = []
+            for mystery_words in games:
+                self.wordle_puzzle.reset()
+                self.setMysteryWords(mystery_words)
+                entered_words.append( self.solve() )
+            return entered_words
+        finally:
+            if remembered:
+                # The class-wide cache, if any, applies again
+                del self.wordle_puzzle.guess_cache
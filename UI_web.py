@@ -1,12 +1,19 @@
+import io
+import os
+from pathlib import Path
+from collections import deque
+
+import matplotlib.image as mpimg
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from pynput.keyboard import Key, Controller
-import mouse
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
 from UI import UI
-from elements import WORD_SIZE
+from puzzle import WordlePuzzle, WordleMultiPuzzle
 
 
 CROMEDRIVER_PATH = "C:\Program Files (x86)\chromedriver.exe"
@@ -15,55 +22,117 @@ WORDLE_PATH = "https://www.nytimes.com/games/wordle/index.html"
 WORDLE_START_COORDINATES = (450, 150)
 WORDLE_X_DIFF = 84
 WORDLE_Y_DIFF = 84
-WORDLE_WAIT_TIME = 2
+# The board markup of the Wordle page, also used by wordle_standin.html
+WORDLE_ROW_SELECTOR = "div[class*='Row-module_row']"
+WORDLE_TILE_SELECTOR = "div[class*='Tile-module_tile']"
+TILE_STATES = {"correct": "1", "present": "2", "absent": "3"}
 
 DORDLE_PATH = "https://zaratustra.itch.io/dordle"
 DORDLE_START_COORDINATES = (295, 115)
 DORDLE_X_DIFF = 68
 DORDLE_Y_DIFF = 65
-DORDLE_WAIT_TIME = 0.23
+
+# Instead of sleeping for a fixed time, the tiles are polled until they have settled
+POLL_INTERVAL = 0.05
+SETTLE_TIMEOUT = 10.0
+# Consecutive screenshots that must agree before their tiles count as settled
+SETTLE_POLLS = 4
+
+READ_ROW_SCRIPT = """
+const rows = document.querySelectorAll(arguments[0]);
+if (arguments[2] >= rows.length) { return null; }
+return Array.from(rows[arguments[2]].querySelectorAll(arguments[1]),
+                  tile => [tile.getAttribute("data-state"), tile.getAttribute("data-animation")]);
+"""
+
+def page_url(url: str) -> str:
+    '''Returns 'url', with paths to local pages (such as wordle_standin.html?word=crane) turned into file URLs.'''
+    if "://" in url:
+        return url
+    path, _, query = url.partition("?")
+    return Path(path).resolve().as_uri() + ("?" + query if query else "")
 
 class WordleBrowserUI(UI):
-    def __init__(self, wordle_object: WordlePuzzle, suppress_error_check: bool = False) -> None:
+    def __init__(self, wordle_object: WordlePuzzle, suppress_error_check: bool = False, url: str = None,
+                 headless: bool = False, driver_path: str = None) -> None:
+        '''The browser is driven by the chromedriver at 'driver_path', or at CROMEDRIVER_PATH if it exists there.
+        Without either, Selenium Manager looks for a driver and downloads one if none is installed, which needs
+        the network; pass a 'driver_path' to run offline, such as against wordle_standin.html.'''
         if not suppress_error_check and wordle_object.getPuzzleSize() != 1:
-            raise Exception("<WordleBrowserUI> Wordle Puzzle is not compatable with the UI.") 
+            raise Exception("<WordleBrowserUI> Wordle Puzzle is not compatable with the UI.")
+        if driver_path != None and not os.path.isfile(driver_path):
+            raise Exception(f"<WordleBrowserUI> No chromedriver at {driver_path}")
 
         super().__init__(wordle_object)
         self.name = "WordleBrowserUI"
+        self.url = page_url(url or WORDLE_PATH)
+        self.headless = headless
+        self.driver_path = driver_path
 
     def launchBrowser(self):
-        self.driver = webdriver.Chrome(CROMEDRIVER_PATH)
-        self.driver.get( WORDLE_PATH )
-
-        self.keyboard = Controller()
-        mouse.move(100, 500, absolute=True, duration=0.2)
-        mouse.click('left')
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+        driver_path = self.driver_path or (CROMEDRIVER_PATH if os.path.isfile(CROMEDRIVER_PATH) else None)
+        # Without a driver path, Selenium Manager finds (or downloads) a driver itself
+        service = Service(driver_path) if driver_path != None else Service()
+        self.driver = webdriver.Chrome(service=service, options=options)
+        self.driver.get( self.url )
+        self.dismissDialogs()
 
         self.start_cord = WORDLE_START_COORDINATES
         self.x_diff = WORDLE_X_DIFF
         self.y_diff = WORDLE_Y_DIFF
-        self.wait_time = WORDLE_WAIT_TIME
+
+    def dismissDialogs(self):
+        '''Closes the dialogs shown over the board when the page opens.'''
+        for button in self.driver.find_elements(By.CSS_SELECTOR, "button[data-testid='Play'], button[aria-label='Close']"):
+            try:
+                button.click()
+            except WebDriverException:
+                pass
+        ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
 
     def quitBrowser(self):
-        time.sleep(2)
         self.driver.quit()
 
     def solve(self):
-        self.launchBrowser()        
-        super().solve()
-        self.quitBrowser()
+        self.launchBrowser()
+        try:
+            super().solve()
+        finally:
+            self.quitBrowser()
 
     def enterWordEntry(self, my_word) -> None:
-        '''Types a given 'my_word' using the laptop keyboard.'''
-        for char in my_word:
-            self.keyboard.press( char )
-            self.keyboard.release( char )
-            time.sleep(0.12)
-        self.keyboard.press( Key.enter )
-        self.keyboard.release( Key.enter )
-        time.sleep(self.wait_time)
+        '''Types a given 'my_word' into the page.'''
+        ActionChains(self.driver).send_keys(my_word, Keys.ENTER).perform()
 
     def obtainConfiguration(self):
+        '''Waits for the tiles of the entered word to settle, and returns their configuration.'''
+        try:
+            return WebDriverWait(self.driver, SETTLE_TIMEOUT, poll_frequency=POLL_INTERVAL).until(
+                lambda _: self.readConfiguration() )
+        except TimeoutException:
+            raise Exception(f"<{self.name}>: The tiles of the entered word did not settle")
+
+    def readConfiguration(self):
+        '''Reads the states of the tiles of the current row from the page, or returns None while they are still revealing.'''
+        tiles = self.driver.execute_script(READ_ROW_SCRIPT, WORDLE_ROW_SELECTOR, WORDLE_TILE_SELECTOR,
+                                           self.wordle_puzzle.steps - 1)
+        if not tiles or len(tiles) != self.wordle_puzzle.config_map.word_size:
+            return None
+        config = ""
+        for state, animation in tiles:
+            if state not in TILE_STATES or animation not in (None, "idle"):
+                return None
+            config += TILE_STATES[state]
+        return config
+
+    def screenshot(self):
+        '''Returns a screenshot of the page, decoded in memory.'''
+        return mpimg.imread( io.BytesIO(self.driver.get_screenshot_as_png()), format="png" )
+
+    def screenshotConfiguration(self):
         '''Uses image proccessing to identify the configuration of the entered my_word.'''
         def findColor(screenshot, x_coordinate, y_coordinate):
             color = screenshot[y_coordinate, x_coordinate, :3]
@@ -77,12 +146,11 @@ class WordleBrowserUI(UI):
                 return "2"
             return "1"
 
-        self.driver.save_screenshot("ss.png")
-        screenshot = plt.imread("ss.png")
+        screenshot = self.screenshot()
         config = ""
 
         y = self.start_cord[1] + (self.wordle_puzzle.steps - 1 ) * self.y_diff
-        for i in range(WORD_SIZE * self.wordle_puzzle.getPuzzleSize()):
+        for i in range(self.wordle_puzzle.config_map.word_size * self.wordle_puzzle.getPuzzleSize()):
             x = self.start_cord[0] + i * self.x_diff
 
             config += findColor(screenshot, x, y)
@@ -90,21 +158,32 @@ class WordleBrowserUI(UI):
         return config
 
 class DordleBrowserUI(WordleBrowserUI):
-    def __init__(self, wordle_object: WordleMultiPuzzle, suppress_error_check: bool = False) -> None:
+    def __init__(self, wordle_object: WordleMultiPuzzle, suppress_error_check: bool = False, url: str = None,
+                 headless: bool = False, driver_path: str = None) -> None:
         if not suppress_error_check and wordle_object.getPuzzleSize() != 2:
-            raise Exception("<DordleBrowserUI> Wordle Puzzle is not compatable with the UI.") 
+            raise Exception("<DordleBrowserUI> Wordle Puzzle is not compatable with the UI.")
 
-        super().__init__(wordle_object, suppress_error_check=True)
+        super().__init__(wordle_object, suppress_error_check=True, url=url or DORDLE_PATH, headless=headless,
+                         driver_path=driver_path)
+        self.name = "DordleBrowserUI"
+        self.recent_reads = deque(maxlen=SETTLE_POLLS)
 
     def launchBrowser(self):
-        self.driver = webdriver.Chrome(CROMEDRIVER_PATH)
-        self.driver.get( DORDLE_PATH )
-
-        self.keyboard = Controller()
-        mouse.move(500, 400, absolute=True, duration=0.2)
-        mouse.click('left')
+        super().launchBrowser()
+        # The game is drawn on a canvas, so its tiles are read from screenshots
+        ActionChains(self.driver).move_by_offset(500, 400).click().perform()
 
         self.start_cord = DORDLE_START_COORDINATES
         self.x_diff = DORDLE_X_DIFF
         self.y_diff = DORDLE_Y_DIFF
-        self.wait_time = DORDLE_WAIT_TIME
+
+    def enterWordEntry(self, my_word) -> None:
+        self.recent_reads.clear()
+        super().enterWordEntry(my_word)
+
+    def readConfiguration(self):
+        '''Returns the configuration read from a screenshot once the last SETTLE_POLLS reads agree, or None.'''
+        self.recent_reads.append( self.screenshotConfiguration() )
+        if len(self.recent_reads) < SETTLE_POLLS or len(set(self.recent_reads)) != 1:
+            return None
+        return self.recent_reads[-1]
@@ -0,0 +1,171 @@
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from elements import load_wordlist
+from puzzle import WordlePuzzle
+from simulate import init_worker, worker_state, create_puzzle, play_game, take_cache_entries, merge_cache_entries
+from simulate import NORMAL_MODE, HARD_MODE, MULTI_MODE
+
+# Puzzles handed to the workers ahead of the one being written out, per worker
+IN_FLIGHT_PER_WORKER = 4
+
+def read_requests(stream):
+    '''Yields (line number, request or None, error) for every non-empty line of a JSONL stream, as it is read.'''
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request is not an object")
+        except ValueError as exception:
+            yield line_number, None, f"<batch>: Invalid request: {exception}"
+            continue
+        yield line_number, request, None
+
+def solve_request(request: dict) -> dict:
+    '''
+    Solves a single puzzle in a worker process. A request is a JSON object with an optional "id" and "mode"
+    ("normal", "hard" or "multi"), and either:
+        "answer": "crane" / "answers": ["crane", "slate"]   -> plays the puzzle to the end against the answers
+        "transcript": [["raise", "33321"], ...]            -> resumes the puzzle from the words entered so far
+    A transcript may be given with the answers, in which case the game is played on from where it left off.
+    Without answers, the result holds the next word to enter.
+    '''
+    mode = request.get("mode", NORMAL_MODE)
+    if mode not in (NORMAL_MODE, HARD_MODE, MULTI_MODE):
+        raise Exception(f"<batch>: Unknown mode {mode!r}")
+    answers = request.get("answers", [request["answer"]] if "answer" in request else None)
+    transcript = request.get("transcript", [])
+    word_size = worker_state["config_map"].word_size
+    if answers != None:
+        no_of_games = len(answers)
+    elif len(transcript) != 0:
+        no_of_games = len(transcript[0][1]) // word_size
+    else:
+        raise Exception("<batch>: A request needs an answer, answers or a transcript")
+    if mode != MULTI_MODE and no_of_games != 1:
+        raise Exception(f"<batch>: A {mode} puzzle has a single answer")
+
+    wordle_puzzle = create_puzzle(worker_state["config_map"], worker_state["word_list"], mode, no_of_games,
+                                  worker_state["lookahead"])
+    entered_words = []
+    for my_word, config in transcript:
+        if len(config) != word_size * no_of_games:
+            raise Exception(f"<batch>: Configuration {config!r} does not match {no_of_games} game(s)")
+        entered_words.append(my_word)
+        if wordle_puzzle.applyGuess(my_word, config):
+            break
+
+    result = {"mode": mode}
+    if answers == None:
+        if not wordle_puzzle.complete:
+            result["next_word"] = next(wordle_puzzle.solutionGenerator())
+        result["entered_words"] = entered_words
+    else:
+        if not wordle_puzzle.complete:
+            entered_words += play_game(wordle_puzzle, answers)
+        result["answers"] = answers
+        result["entered_words"] = entered_words
+        result["guesses"] = len(entered_words)
+    result["complete"] = wordle_puzzle.complete
+    return result
+
+def run_request(args: tuple) -> dict:
+    '''Solves a request, turning any error into part of its result.'''
+    line_number, request = args
+    start = time.perf_counter()
+    try:
+        result = solve_request(request)
+        result["error"] = None
+    except Exception as exception:
+        result = {"error": str(exception)}
+    result = {"id": request.get("id", line_number), **result, "time": time.perf_counter() - start}
+    return take_cache_entries(result)
+
+def run_batch(requests, output, path_to_config: str, possible_word_list: list[str], accepted_word_list: list[str],
+              workers: int = None, shared_memory: bool = False, guess_cache_path: str = None) -> int:
+    '''
+    Solves the requests of a JSONL stream over a pool of 'workers' processes, and writes a JSONL result line
+    for each one to 'output', in the order of the requests. Requests are read as results are written, with
+    at most IN_FLIGHT_PER_WORKER per worker waiting, so the memory used does not grow with the size of the batch.
+    Returns the number of requests.
+    '''
+    init_args = (path_to_config, possible_word_list, accepted_word_list, None, guess_cache_path)
+    # Build the cache once, before the workers race to do it
+    init_worker(*init_args)
+
+    def write(result: dict) -> None:
+        output.write(json.dumps( merge_cache_entries(result) ) + "\n")
+        output.flush()
+
+    workers = workers or os.cpu_count() or 1
+    count = 0
+    if workers == 1:
+        for line_number, request, error in requests:
+            write( {"id": line_number, "error": error} if request is None else run_request((line_number, request)) )
+            count += 1
+        if WordlePuzzle.guess_cache != None:
+            WordlePuzzle.guess_cache.save()
+        return count
+
+    config_map = worker_state["config_map"]
+    if shared_memory:
+        init_args += (config_map.publish(),)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=init_args) as executor:
+            # Results are written in order: a request waits behind the oldest one still being solved
+            pending = deque()
+            def ready() -> bool:
+                return isinstance(pending[0], dict) or pending[0].done()
+            def write_oldest() -> None:
+                oldest = pending.popleft()
+                write( oldest if isinstance(oldest, dict) else oldest.result() )
+
+            for line_number, request, error in requests:
+                if request is None:
+                    pending.append( {"id": line_number, "error": error} )
+                else:
+                    pending.append( executor.submit(run_request, (line_number, request)) )
+                count += 1
+                while pending and (len(pending) >= workers * IN_FLIGHT_PER_WORKER or ready()):
+                    write_oldest()
+            while pending:
+                write_oldest()
+    finally:
+        config_map.release()
+    if WordlePuzzle.guess_cache != None:
+        WordlePuzzle.guess_cache.save()
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solves a stream of puzzles given as JSONL, writing a JSONL result for each.")
+    parser.add_argument("input", nargs="?", default="-", help="file of requests, or - for stdin")
+    parser.add_argument("--output", default="-", help="file for the results, or - for stdout")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shared-memory", action="store_true",
+                        help="publish the config map to shared memory once, instead of every worker mapping the cache file")
+    parser.add_argument("--guess-cache", default=None, metavar="PATH", help="share the best next words through this file")
+    parser.add_argument("--config-map", default="wordle_data.bin")
+    parser.add_argument("--possible", default="wordle_words.txt")
+    parser.add_argument("--accepted", default="all_words.txt")
+    args = parser.parse_args()
+
+    input_file = sys.stdin if args.input == "-" else open(args.input, "r")
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        start = time.perf_counter()
+        count = run_batch(read_requests(input_file), output_file, args.config_map, load_wordlist(args.possible),
+                          load_wordlist(args.accepted), args.workers, args.shared_memory, args.guess_cache)
+        print(f"<batch>: Solved {count} requests in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
@@ -0,0 +1,208 @@
+
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from elements import Configuration, ConfigMap, WordSet, load_wordlist
+from puzzle import WordlePuzzle, WordleHardPuzzle
+from simulate import git_revision
+
+SEED = 0
+DEFAULT_BASELINE_PATH = "benchmarks_baseline.json"
+# A case regresses once its time or peak memory grows past the baseline by more than this fraction
+DEFAULT_THRESHOLD = 0.25
+# Peak memory may also grow by this many bytes, so that cases allocating almost nothing do not fail on noise
+PEAK_SLACK = 64 * 2**10
+DEFAULT_REPEATS = 5
+# Short cases are run in a loop, so that every timed run takes at least this long
+MIN_RUN_TIME = 0.05
+# Words of the subsets the config map build and load cases run on
+BUILD_POSSIBLE_WORDS = 300
+BUILD_ACCEPTED_WORDS = 1000
+# Sizes of the sets of possible answers findNextWord is timed at
+FIND_NEXT_WORD_SIZES = (2309, 250, 25)
+
+class Case():
+    '''A benchmark: 'setup()' prepares its inputs and returns the function timed, which makes 'calls' calls per run.'''
+    def __init__(self, name: str, setup, calls: int = 1, repeats: int = DEFAULT_REPEATS) -> None:
+        self.name = name
+        self.setup = setup
+        self.calls = calls
+        self.repeats = repeats
+
+    def __str__(self) -> str:
+        return f"<Case Object> {self.name}, Calls: {self.calls}, Repeats: {self.repeats}"
+
+    def run(self) -> dict:
+        '''Returns the best time per call over the repeats, and the peak memory traced during a separate run.
+        As with timeit, the garbage collector is off while the calls are timed.'''
+        function = self.setup()
+        start = time.perf_counter()
+        function()
+        loops = max(1, int(MIN_RUN_TIME / max(time.perf_counter() - start, 1e-9)))
+        times = []
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(self.repeats):
+                start = time.perf_counter()
+                for _ in range(loops):
+                    function()
+                times.append( (time.perf_counter() - start) / (loops * self.calls) )
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        # Tracing slows the calls down, so the memory is measured apart from the timed runs
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {"time": min(times), "median_time": float(np.median(times)), "peak": peak,
+                "calls": self.calls * loops, "repeats": self.repeats}
+
+def create_cases(config_map: ConfigMap, word_list: list[str], accepted_word_list: list[str], temp_dir: str) -> list[Case]:
+    '''Returns the cases of the suite. Every word, subset and set of answers is drawn from generators seeded with SEED.'''
+    generator = random.Random(SEED)
+    cases = []
+
+    pairs = [(generator.choice(word_list), generator.choice(accepted_word_list)) for _ in range(2000)]
+    def configuration():
+        def function():
+            for mystery_word, check_word in pairs:
+                Configuration(mystery_word, check_word)
+        return function
+    cases.append( Case("Configuration", configuration, calls=len(pairs)) )
+
+    build_possible = sorted(generator.sample(word_list, BUILD_POSSIBLE_WORDS))
+    build_accepted = sorted(set(generator.sample(accepted_word_list, BUILD_ACCEPTED_WORDS)) | set(build_possible))
+    def config_map_build():
+        def function():
+            ConfigMap.__new__(ConfigMap).createConfigMap(build_possible, build_accepted, workers=1, progress=lambda *_: None)
+        return function
+    cases.append( Case("ConfigMap.build", config_map_build, repeats=3) )
+
+    def config_map_load():
+        path_to_config = os.path.join(temp_dir, "benchmark_data.bin")
+        ConfigMap(path_to_config, build_possible, build_accepted, workers=1, progress=lambda *_: None)
+        def function():
+            ConfigMap(path_to_config, build_possible, build_accepted)
+        return function
+    cases.append( Case("ConfigMap.load", config_map_load) )
+
+    guesses = [(generator.choice(accepted_word_list), generator.choice(word_list)) for _ in range(200)]
+    def reduce_word_set():
+        # Each guess reduces a full set of its own, as applying them in turn would soon empty it. Applying a guess
+        # again leaves its set as it is and costs the same, so the sets are not reset between runs.
+        word_sets = [WordSet(word_list, config_map) for _ in guesses]
+        configurations = [Configuration(mystery_word, my_word) for my_word, mystery_word in guesses]
+        def function():
+            for (my_word, _), configuration, word_set in zip(guesses, configurations, word_sets):
+                word_set.reduceWordSet(my_word, config_map, configuration)
+        return function
+    cases.append( Case("WordSet.reduceWordSet", reduce_word_set, calls=len(guesses)) )
+
+    check_words = generator.sample(accepted_word_list, 200)
+    def expected_bits_in_word():
+        word_set = WordSet(word_list, config_map)
+        def function():
+            for my_word in check_words:
+                word_set.expectedBitsInWord(config_map, my_word)
+        return function
+    cases.append( Case("WordSet.expectedBitsInWord", expected_bits_in_word, calls=len(check_words)) )
+
+    for size in FIND_NEXT_WORD_SIZES:
+        candidates = word_list if size >= len(word_list) else generator.sample(word_list, size)
+        def find_next_word(candidates=candidates):
+            wordle_puzzle = WordlePuzzle(config_map, candidates)
+            # The search itself is timed, rather than a lookup in the opening book
+            wordle_puzzle.use_opening_book = False
+            return wordle_puzzle.findNextWord
+        cases.append( Case(f"WordlePuzzle.findNextWord[{len(candidates)}]", find_next_word, repeats=3 if size >= 1000 else DEFAULT_REPEATS) )
+
+    hard_mystery_word, hard_word = generator.choice(word_list), generator.choice(accepted_word_list)
+    def is_valid_word():
+        wordle_puzzle = WordleHardPuzzle(config_map, word_list)
+        wordle_puzzle.applyGuess(hard_word, Configuration(hard_mystery_word, hard_word).get_config_string())
+        def function():
+            for word in accepted_word_list:
+                wordle_puzzle.isValidWord(word)
+        return function
+    cases.append( Case("WordleHardPuzzle.isValidWord", is_valid_word, calls=len(accepted_word_list)) )
+    return cases
+
+def run_cases(cases: list[Case], pattern: str = None, stream = sys.stderr) -> dict[str, dict]:
+    '''Runs the cases whose names contain 'pattern' (all by default), and returns their results by name.'''
+    results = {}
+    for case in cases:
+        if pattern != None and pattern not in case.name:
+            continue
+        results[case.name] = case.run()
+        print(f"<benchmarks>: {case.name}: {results[case.name]['time'] * 1e6:.1f}us per call, "
+              f"peak {results[case.name]['peak'] / 2**10:.0f} KiB", file=stream)
+    return results
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    '''Returns a description of every case whose time or peak memory regressed past the baseline by more than 'threshold'.'''
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for measure in ("time", "peak"):
+            before, after = baseline[name][measure], result[measure]
+            if before > 0 and after > before * (1 + threshold) + (PEAK_SLACK if measure == "peak" else 0):
+                regressions.append(f"{name}: {measure} {before:.6g} -> {after:.6g} (+{100 * (after / before - 1):.0f}%)")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the hot paths of the solver on fixed word subsets, and checks them against a baseline.")
+    parser.add_argument("--case", default=None, help="only run the cases whose names contain this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="fraction a case may regress by")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--config-map", default="wordle_data.bin")
+    parser.add_argument("--possible", default="wordle_words.txt")
+    parser.add_argument("--accepted", default="all_words.txt")
+    args = parser.parse_args()
+
+    possible_words = load_wordlist(args.possible)
+    accepted_words = load_wordlist(args.accepted)
+    configuration_map = ConfigMap(args.config_map, possible_words, accepted_words)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        benchmark_results = run_cases(create_cases(configuration_map, possible_words, accepted_words, temp_dir), args.case)
+    report = {"revision": git_revision(), "threshold": args.threshold, "cases": benchmark_results}
+    if args.output != None:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=1)
+
+    if args.save_baseline:
+        # Cases not run this time keep their baseline
+        baseline_cases = {}
+        if os.path.isfile(args.baseline):
+            with open(args.baseline, "r") as baseline_file:
+                baseline_cases = json.load(baseline_file)["cases"]
+        baseline_cases.update(benchmark_results)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump({**report, "cases": baseline_cases}, baseline_file, indent=1)
+        print(f"<benchmarks>: Saved the baseline to {args.baseline}", file=sys.stderr)
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline, "r") as baseline_file:
+            regressions = compare(benchmark_results, json.load(baseline_file)["cases"], args.threshold)
+        for regression in regressions:
+            print(f"<benchmarks>: Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"<benchmarks>: No case regressed past {100 * args.threshold:.0f}% of the baseline", file=sys.stderr)
+    else:
+        print(f"<benchmarks>: No baseline at {args.baseline}; run with --save-baseline to store one", file=sys.stderr)
@@ -0,0 +1,144 @@
+
+import os
+import sys
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from elements import GREEN, YELLOW, code_dtype
+
+DEFAULT_CHUNK_SIZE = 256
+
+class ProgressReporter():
+    '''Progress callback that prints at most once every 'interval' seconds.'''
+    def __init__(self, label: str, interval: float = 1.0, stream = None) -> None:
+        self.label = label
+        self.interval = interval
+        self.stream = stream if stream != None else sys.stderr
+        self.start_time = time.perf_counter()
+        self.last_report = -math.inf
+
+    def __call__(self, done: int, total: int) -> None:
+        now = time.perf_counter()
+        if done < total and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = now - self.start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        print(f"{self.label}: {done}/{total} ({100.0 * done / max(total, 1):.0f}%) {rate:.0f}/s", file=self.stream)
+
+def encode_words(word_list: list[str]) -> np.ndarray:
+    '''Returns the words as a (words, letters) array of character codes.'''
+    if len(word_list) == 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+    return np.frombuffer( "".join(word_list).encode("ascii"), dtype=np.uint8 ).reshape(len(word_list), -1)
+
+def feedback_block(check_letters: np.ndarray, mystery_letters: np.ndarray) -> np.ndarray:
+    '''Returns the config codes for every (check_word, mystery_word) pair, as a (checks, mysteries) array.
+    Follows the same rules as Configuration(mystery_word, check_word): GREEN letters are matched first, then
+    each remaining letter is YELLOW while the mystery_word still has unmatched copies of it.'''
+    word_size = check_letters.shape[1]
+    checks = check_letters[:, None, :]
+    mysteries = mystery_letters[None, :, :]
+
+    green = checks == mysteries
+    yellow = np.zeros_like(green)
+    for index in range(word_size):
+        letter = checks[:, :, index:index + 1]
+        # Copies of this letter in the mystery_word that were not matched as GREEN
+        available = ((mysteries == letter) & ~green).sum(axis=2)
+        # Copies already claimed by earlier YELLOW letters of the check_word
+        claimed = (yellow[:, :, :index] & (checks[:, :, :index] == letter)).sum(axis=2)
+        yellow[:, :, index] = ~green[:, :, index] & (available > claimed)
+
+    dtype = code_dtype(word_size)
+    codes = np.zeros(green.shape[:2], dtype=dtype)
+    for index in range(word_size):
+        codes *= 3
+        codes += green[:, :, index] * dtype.type(GREEN % 3) + yellow[:, :, index] * dtype.type(YELLOW % 3)
+    return codes
+
+def _feedback_chunk(args: tuple) -> tuple[int, np.ndarray]:
+    start, check_letters, mystery_letters = args
+    return start, feedback_block(check_letters, mystery_letters)
+
+def build_matrix(possible_word_list: list[str], accepted_word_list: list[str], out: np.ndarray = None,
+                 workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE, progress = None) -> np.ndarray:
+    '''Computes the (accepted, possible) config matrix in chunks of accepted words.
+    The chunks are spread over 'workers' processes (all cores by default), and written into 'out' if it is given,
+    which may be a memory-map of the cache file. 'progress(done, total)' is called after every chunk.'''
+    check_letters = encode_words(accepted_word_list)
+    mystery_letters = encode_words(possible_word_list)
+    total = len(accepted_word_list)
+    if out is None:
+        out = np.empty((total, len(possible_word_list)), dtype=code_dtype(mystery_letters.shape[1]))
+
+    chunks = [(start, check_letters[start:start + chunk_size], mystery_letters) for start in range(0, total, chunk_size)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(chunks))
+
+    def store(results) -> np.ndarray:
+        done = 0
+        for start, block in results:
+            out[start:start + len(block)] = block
+            done += len(block)
+            if progress != None:
+                progress(done, total)
+        return out
+
+    if workers <= 1:
+        return store( map(_feedback_chunk, chunks) )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return store( executor.map(_feedback_chunk, chunks) )
+
+def word_positions(word_list: list[str], old_word_list: list[str]) -> np.ndarray:
+    '''Returns the position of every word in 'old_word_list', or -1 for the words it does not have.'''
+    old_index = {word: index for index, word in enumerate(old_word_list)}
+    return np.array([old_index.get(word, -1) for word in word_list], dtype=np.intp)
+
+def uncovered_cells(old_possible_word_list: list[str], old_accepted_word_list: list[str],
+                    possible_word_list: list[str], accepted_word_list: list[str]) -> int:
+    '''Returns the number of cells of the new config matrix that the old one does not have.'''
+    new_columns = int(np.count_nonzero(word_positions(possible_word_list, old_possible_word_list) < 0))
+    kept_rows = int(np.count_nonzero(word_positions(accepted_word_list, old_accepted_word_list) >= 0))
+    return len(accepted_word_list) * len(possible_word_list) - kept_rows * (len(possible_word_list) - new_columns)
+
+def update_matrix(old_possible_word_list: list[str], old_accepted_word_list: list[str], old_matrix: np.ndarray,
+                  possible_word_list: list[str], accepted_word_list: list[str], out: np.ndarray = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+    '''Computes the config matrix of new word lists from the matrix of old ones. The cells of words in both are copied,
+    and only the rows of new accepted words and the columns of new possible words are computed; deleted words are dropped.'''
+    possible_positions = word_positions(possible_word_list, old_possible_word_list)
+    accepted_positions = word_positions(accepted_word_list, old_accepted_word_list)
+    kept_columns = np.flatnonzero(possible_positions >= 0)
+    new_columns = np.flatnonzero(possible_positions < 0)
+    kept_rows = np.flatnonzero(accepted_positions >= 0)
+    new_rows = np.flatnonzero(accepted_positions < 0)
+    if out is None:
+        out = np.empty((len(accepted_word_list), len(possible_word_list)), dtype=old_matrix.dtype)
+
+    check_letters = encode_words(accepted_word_list)
+    mystery_letters = encode_words(possible_word_list)
+    old_columns = possible_positions[kept_columns]
+    # When possible words were only appended, the old rows are a prefix of the new ones
+    appended_only = np.array_equal(kept_columns, np.arange(len(kept_columns))) and \
+                    np.array_equal(old_columns, np.arange(len(old_possible_word_list)))
+    for start in range(0, len(kept_rows), chunk_size):
+        rows = kept_rows[start:start + chunk_size]
+        old_rows = old_matrix[ accepted_positions[rows] ]
+        block = np.empty((len(rows), len(possible_word_list)), dtype=out.dtype)
+        if appended_only:
+            block[:, :len(old_columns)] = old_rows
+        else:
+            block[:, kept_columns] = old_rows[:, old_columns]
+        if len(new_columns) != 0:
+            block[:, new_columns] = feedback_block(check_letters[rows], mystery_letters[new_columns])
+        out[rows] = block
+
+    for start in range(0, len(new_rows), chunk_size):
+        rows = new_rows[start:start + chunk_size]
+        out[rows] = feedback_block(check_letters[rows], mystery_letters)
+    return out
@@ -0,0 +1,127 @@
+
+import os
+import json
+import struct
+import hashlib
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+# Layout of a cache file:
+#   magic (8 bytes) | format version (uint32) | header length (uint32) | JSON header | padding | matrix
+# The matrix is stored row-major right after the header, aligned to DATA_ALIGNMENT bytes,
+# so that it can be memory-mapped directly without copying it to the heap.
+CACHE_MAGIC = b"WORDLEMX"
+CACHE_VERSION = 1
+DATA_ALIGNMENT = 64
+PREFIX = struct.Struct("<8sII")
+
+def word_list_hash(word_list: list[str]) -> str:
+    '''Returns a hash identifying the contents and order of a word list.'''
+    return hashlib.sha256( "\n".join(word_list).encode() ).hexdigest()
+
+def make_header(possible_word_list: list[str], accepted_word_list: list[str], dtype) -> dict:
+    '''Returns the header describing a matrix built from the given word lists.'''
+    return {
+        "version": CACHE_VERSION,
+        "dtype": np.dtype(dtype).str,
+        "shape": [len(accepted_word_list), len(possible_word_list)],
+        "possible_hash": word_list_hash(possible_word_list),
+        "accepted_hash": word_list_hash(accepted_word_list),
+        "possible": possible_word_list,
+        "accepted": accepted_word_list,
+    }
+
+def encode_header(header: dict) -> bytes:
+    '''Encodes the prefix and the header, padded so that the matrix that follows is aligned.'''
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    prefix = PREFIX.pack(CACHE_MAGIC, CACHE_VERSION, len(header_bytes))
+    padding = -(len(prefix) + len(header_bytes)) % DATA_ALIGNMENT
+    return prefix + header_bytes + b" " * padding
+
+def decode_header(buffer) -> tuple[dict, int]:
+    '''Returns the header and the offset of the matrix. The buffer must start with a cache of this version.'''
+    magic, version, header_length = PREFIX.unpack_from(buffer, 0)
+    if magic != CACHE_MAGIC or version != CACHE_VERSION:
+        raise Exception("<cache>: Unsupported cache format")
+    header_end = PREFIX.size + header_length
+    header = json.loads( bytes(buffer[PREFIX.size:header_end]) )
+    offset = header_end + (-header_end % DATA_ALIGNMENT)
+    return header, offset
+
+def matches(header: dict, possible_word_list: list[str], accepted_word_list: list[str]) -> bool:
+    '''Checks if the header was built from the given word lists.'''
+    return (header["possible_hash"] == word_list_hash(possible_word_list)
+            and header["accepted_hash"] == word_list_hash(accepted_word_list))
+
+def open_cache_for_writing(path: str, possible_word_list: list[str], accepted_word_list: list[str], dtype = np.uint8) -> tuple[str, np.memmap]:
+    '''Creates a temporary cache file next to 'path' and returns its name with a writable memory-map of its matrix.
+    Fill the matrix and pass both to commit_cache.'''
+    header = make_header(possible_word_list, accepted_word_list, dtype)
+    encoded_header = encode_header(header)
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, "wb") as cache_file:
+        cache_file.write( encoded_header )
+    matrix = np.memmap(temp_path, dtype=np.dtype(dtype), mode="r+", offset=len(encoded_header), shape=tuple(header["shape"]))
+    return temp_path, matrix
+
+def commit_cache(temp_path: str, path: str, matrix: np.memmap) -> None:
+    '''Flushes a cache created by open_cache_for_writing and atomically moves it to 'path'.
+    The matrix is unmapped first, so it must not be used afterwards.'''
+    matrix.flush()
+    close_cache(matrix)
+    os.replace(temp_path, path)
+
+def close_cache(matrix: np.memmap) -> None:
+    '''Unmaps a matrix memory-mapped from a cache file, which Windows requires before the file is replaced.
+    Dropping the array is not enough while other references to it remain, so the mapping itself is closed
+    and the matrix must not be used afterwards.'''
+    mapping = getattr(matrix, "_mmap", None)
+    if mapping != None:
+        mapping.close()
+
+def write_cache(path: str, possible_word_list: list[str], accepted_word_list: list[str], matrix: np.ndarray) -> None:
+    '''Writes the matrix to 'path'. The file is replaced atomically so readers never see a partial cache.'''
+    temp_path, out = open_cache_for_writing(path, possible_word_list, accepted_word_list, matrix.dtype)
+    out[:] = matrix
+    commit_cache(temp_path, path, out)
+
+def read_cache(path: str) -> tuple[dict, np.ndarray]:
+    '''Memory-maps the cache at 'path' read-only. Returns None if it is missing or in another format.'''
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as cache_file:
+        prefix = cache_file.read(PREFIX.size)
+        if len(prefix) < PREFIX.size or PREFIX.unpack(prefix)[:2] != (CACHE_MAGIC, CACHE_VERSION):
+            return None
+        header_length = PREFIX.unpack(prefix)[2]
+        header, offset = decode_header( prefix + cache_file.read(header_length) )
+    matrix = np.memmap(path, dtype=np.dtype(header["dtype"]), mode="r", offset=offset, shape=tuple(header["shape"]))
+    return header, matrix
+
+def publish_shared(possible_word_list: list[str], accepted_word_list: list[str], matrix: np.ndarray) -> SharedMemory:
+    '''Copies the matrix, laid out as a cache file, into a new block of shared memory.
+    The caller owns the block, and must close and unlink it once every reader is done.'''
+    encoded_header = encode_header( make_header(possible_word_list, accepted_word_list, matrix.dtype) )
+    shared_memory = SharedMemory(create=True, size=len(encoded_header) + matrix.nbytes)
+    shared_memory.buf[:len(encoded_header)] = encoded_header
+    np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shared_memory.buf, offset=len(encoded_header))[:] = matrix
+    return shared_memory
+
+def attach_shared(name: str) -> tuple[SharedMemory, dict, np.ndarray]:
+    '''Attaches to a block created by publish_shared, and returns it with its header and a read-only view of its matrix.'''
+    # Readers must not unlink the block when they exit, which older Pythons do for every block they open
+    try:
+        shared_memory = SharedMemory(name=name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            shared_memory = SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+    header, offset = decode_header(shared_memory.buf)
+    matrix = np.ndarray(tuple(header["shape"]), dtype=np.dtype(header["dtype"]), buffer=shared_memory.buf, offset=offset)
+    matrix.flags.writeable = False
+    return shared_memory, header, matrix
@@ -0,0 +1,111 @@
+
+import os
+import sys
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+from elements import Configuration, ConfigMap, load_wordlist
+import build
+
+SEED = 0
+DEFAULT_PAIRS = 200000
+# Random words of each side of the blocks compared, whose cells are all random pairs
+BLOCK_SIDE = 50
+# Letters of the made up words, few enough that most words repeat some of them
+SMALL_ALPHABET = "aabcde"
+MADE_UP_LENGTHS = (3, 4, 6, 7)
+
+def made_up_words(generator: random.Random, length: int, count: int) -> list[str]:
+    '''Returns 'count' distinct words of 'length' letters drawn from a small alphabet, so that they share many letters.'''
+    words = set()
+    while len(words) < count:
+        words.add( "".join(generator.choice(SMALL_ALPHABET) for _ in range(length)) )
+    return sorted(words)
+
+def compare_block(check_words: list[str], mystery_words: list[str]) -> int:
+    '''Compares every cell of a feedback_block with Configuration, and returns the number of mismatches.'''
+    codes = build.feedback_block( build.encode_words(check_words), build.encode_words(mystery_words) ).tolist()
+    mismatches = 0
+    for check_word, row in zip(check_words, codes):
+        for mystery_word, code in zip(mystery_words, row):
+            expected = Configuration(mystery_word, check_word).get_code()
+            if code != expected:
+                mismatches += 1
+                print(f"<check_build>: feedback_block({check_word!r}, {mystery_word!r}) = {code}, Configuration gives {expected}",
+                      file=sys.stderr)
+    return mismatches
+
+def check_feedback(word_list: list[str], accepted_word_list: list[str], pairs: int, generator: random.Random) -> int:
+    '''Compares feedback_block with Configuration over about 'pairs' random (check_word, mystery_word) pairs of the
+    word lists, and over every pair of made up words of other lengths. Returns the number of mismatches.'''
+    mismatches = 0
+    side = BLOCK_SIDE
+    for _ in range(max(1, pairs // side ** 2)):
+        mismatches += compare_block([generator.choice(accepted_word_list) for _ in range(side)],
+                                    [generator.choice(word_list) for _ in range(side)])
+    for length in MADE_UP_LENGTHS:
+        words = made_up_words(generator, length, 60)
+        mismatches += compare_block(words, words)
+    return mismatches
+
+def edits(possible_word_list: list[str], accepted_word_list: list[str], extra_words: list[str],
+          generator: random.Random) -> dict[str, tuple[list[str], list[str]]]:
+    '''Returns new (possible, accepted) word lists, by name, that add, delete and reorder words of the given ones.'''
+    added = possible_word_list + extra_words
+    deleted = [word for word in possible_word_list if generator.random() > 0.1]
+    kept = set(deleted)
+    reordered = generator.sample(possible_word_list, len(possible_word_list))
+    mixed = generator.sample(deleted, len(deleted)) + extra_words
+    return {
+        "append": (added, accepted_word_list + extra_words),
+        "add_accepted": (possible_word_list, sorted(accepted_word_list + extra_words)),
+        "delete": (deleted, [word for word in accepted_word_list if word in kept or generator.random() > 0.1]),
+        "reorder": (reordered, generator.sample(accepted_word_list, len(accepted_word_list))),
+        "mixed": (mixed, generator.sample(accepted_word_list, len(accepted_word_list) // 2) + extra_words),
+    }
+
+def check_update(word_list: list[str], accepted_word_list: list[str], generator: random.Random, temp_dir: str) -> int:
+    '''Checks that updating a config matrix (directly, and through a cached ConfigMap) to edited word lists
+    gives the same bytes as building it again. Returns the number of edits that did not.'''
+    possible = generator.sample(word_list, 300)
+    extra_words = [word for word in generator.sample(word_list, 60) if word not in set(possible)]
+    accepted = sorted( set(generator.sample(accepted_word_list, 600)) | set(possible) )
+    old_matrix = build.build_matrix(possible, accepted, workers=1)
+
+    failures = 0
+    for name, (new_possible, new_accepted) in edits(possible, accepted, extra_words, generator).items():
+        rebuilt = build.build_matrix(new_possible, new_accepted, workers=1)
+        updated = build.update_matrix(possible, accepted, old_matrix, new_possible, new_accepted)
+
+        path_to_config = os.path.join(temp_dir, f"check_{name}.bin")
+        ConfigMap(path_to_config, possible, accepted, workers=1, progress=lambda *_: None)
+        config_map = ConfigMap(path_to_config, new_possible, new_accepted, workers=1, progress=lambda *_: None)
+        cached = np.asarray(config_map.matrix)
+
+        for label, matrix in (("update_matrix", updated), ("ConfigMap", cached)):
+            if matrix.dtype != rebuilt.dtype or matrix.tobytes() != rebuilt.tobytes():
+                failures += 1
+                print(f"<check_build>: {label} after {name!r} differs from a full build", file=sys.stderr)
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the vectorized config map build and its incremental update against Configuration.")
+    parser.add_argument("--pairs", type=int, default=DEFAULT_PAIRS, help="random word pairs compared with Configuration")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--possible", default="wordle_words.txt")
+    parser.add_argument("--accepted", default="all_words.txt")
+    args = parser.parse_args()
+
+    possible_words = load_wordlist(args.possible)
+    accepted_words = load_wordlist(args.accepted)
+    generator = random.Random(args.seed)
+    mismatches = check_feedback(possible_words, accepted_words, args.pairs, generator)
+    print(f"<check_build>: feedback_block: {mismatches} mismatches", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        failures = check_update(possible_words, accepted_words, generator, temp_dir)
+    print(f"<check_build>: update_matrix: {failures} edits differ from a full build", file=sys.stderr)
+    if mismatches or failures:
+        sys.exit(1)
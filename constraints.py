@@ -0,0 +1,55 @@
+
+import numpy as np
+
+from elements import ConfigMap, Configuration
+from elements import GREEN, YELLOW
+
+class HardModeConstraints():
+    '''
+    Accumulates the Hard Mode rules of a puzzle over every guess entered so far:
+    GREEN letters must stay in their position, and every revealed letter must be used
+    at least as many times as it was revealed (GREEN and YELLOW) in a single guess.
+    '''
+    def __init__(self, config_map: ConfigMap) -> None:
+        self.config_map = config_map
+        self.greens: dict[int, str] = {}
+        self.min_counts: dict[str, int] = {}
+        self.valid = np.ones(len(config_map.accepted_words), dtype=bool)
+
+    def __str__(self) -> str:
+        return f"<HardModeConstraints Object> Greens: {self.greens}, Minimum Counts: {self.min_counts}"
+
+    def add(self, my_word: str, configuration: Configuration) -> None:
+        '''Adds the rules revealed by entering 'my_word' and recieving 'configuration', and narrows the valid words.'''
+        letters, counts = self.config_map.acceptedLetters()
+        revealed: dict[str, int] = {}
+        for index, color in enumerate(configuration.get_config()):
+            if color == GREEN and index not in self.greens:
+                self.greens[index] = my_word[index]
+                self.valid &= letters[:, index] == ord(my_word[index])
+            if color in (GREEN, YELLOW):
+                revealed[my_word[index]] = revealed.get(my_word[index], 0) + 1
+
+        for letter, count in revealed.items():
+            if count <= self.min_counts.get(letter, 0):
+                continue
+            self.min_counts[letter] = count
+            self.valid &= counts[:, ord(letter) - ord("a")] >= count
+
+    def isValidWord(self, word: str) -> bool:
+        '''Checks if 'word' follows every rule.'''
+        for index, letter in self.greens.items():
+            if word[index] != letter:
+                return False
+        for letter, count in self.min_counts.items():
+            if word.count(letter) < count:
+                return False
+        return True
+
+    def validWordMask(self) -> np.ndarray:
+        '''Returns the mask of accepted words that follow every rule.'''
+        return self.valid
+
+    def key(self) -> tuple:
+        '''Returns a hashable summary of the rules.'''
+        return ( tuple(sorted(self.greens.items())), tuple(sorted(self.min_counts.items())) )
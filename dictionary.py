@@ -0,0 +1,219 @@
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+import weakref
+
+from elements import ConfigMap, WORD_SIZE, code_dtype, load_wordlist
+import cache
+import metrics
+
+DEFAULT_DICTIONARY = "default"
+# Cache file of the default dictionary in the cache directory, the one every other tool reads by default
+DEFAULT_CONFIG_MAP = "wordle_data.bin"
+# Cache file of every shard in the cache directory, by its number of letters and the hash of its word lists
+SHARD_FILE_NAME = "wordle_data_{length}_{hash}.bin"
+SHARD_HASH_LENGTH = 16
+
+def dictionary_hash(possible_word_list: list[str], accepted_word_list: list[str]) -> str:
+    '''Returns a hash identifying both word lists of a shard.'''
+    return hashlib.sha256( (cache.word_list_hash(possible_word_list) + cache.word_list_hash(accepted_word_list)).encode() ).hexdigest()
+
+def length_path(path_to_config: str, length: int) -> str:
+    '''Returns the cache path of the 'length' letter words of a dictionary cached at 'path_to_config': the path itself
+    for words of WORD_SIZE letters, and the path with the length added to its name for the others.'''
+    if length == WORD_SIZE:
+        return path_to_config
+    stem, extension = os.path.splitext(path_to_config)
+    return f"{stem}_{length}{extension}"
+
+def split_by_length(word_list: list[str]) -> dict[int, list[str]]:
+    '''Returns the words of 'word_list' by their number of letters, keeping their order. Blank lines are skipped.'''
+    words_by_length = {}
+    for word in word_list:
+        word = word.strip().lower()
+        if word == "":
+            continue
+        if not word.isascii() or not word.isalpha():
+            raise Exception(f"<DictionaryRegistry>: Invalid word {word!r}")
+        words_by_length.setdefault(len(word), []).append(word)
+    return words_by_length
+
+class Shard():
+    '''The word lists of a single word length of a dictionary, and their config map once it is loaded.'''
+    def __init__(self, length: int, possible_word_list: list[str], accepted_word_list: list[str], path_to_config: str) -> None:
+        self.length = length
+        self.possible_words = possible_word_list
+        self.accepted_words = accepted_word_list
+        self.hash = dictionary_hash(possible_word_list, accepted_word_list)
+        self.path_to_config = path_to_config
+        self.config_map = None
+        # Puzzles created from the shard that are still alive; the shard is idle once there are none
+        self.puzzles = weakref.WeakSet()
+        self.last_used = 0.0
+
+    def __str__(self) -> str:
+        return f"<Shard Object> Length: {self.length}, Words: {len(self.possible_words)}/{len(self.accepted_words)}, Loaded: {self.config_map != None}"
+
+    def key(self) -> tuple[int, str]:
+        return (self.length, self.hash)
+
+    def size(self) -> int:
+        '''Returns the number of bytes of the config matrix, loaded or not.'''
+        if self.config_map != None:
+            return self.config_map.matrix.nbytes
+        return len(self.accepted_words) * len(self.possible_words) * code_dtype(self.length).itemsize
+
+    def isIdle(self) -> bool:
+        return len(self.puzzles) == 0
+
+class DictionaryRegistry():
+    '''
+    Serves puzzles of any word length from any number of dictionaries, from one process. The words of a dictionary
+    are split by length into shards, each keyed by its length and the hash of its word lists, with a config map
+    of its own cached in 'cache_dir'. Dictionaries with the same words of a length share that shard.
+
+    A shard's config map is only loaded (or built) when the first puzzle of its length is created. While the
+    loaded maps take more than 'memory_cap' bytes, the least recently used shards that no puzzle uses any more
+    are unloaded, to be loaded again on demand.
+    '''
+    def __init__(self, cache_dir: str = ".", memory_cap: int = None, workers: int = None) -> None:
+        self.cache_dir = cache_dir
+        self.memory_cap = memory_cap
+        self.workers = workers
+        self.shards: dict[tuple[int, str], Shard] = {}
+        # dictionary name -> word length -> shard key
+        self.dictionaries: dict[str, dict[int, tuple[int, str]]] = {}
+        self.lock = threading.RLock()
+        self.loads = 0
+        self.evictions = 0
+
+    def __str__(self) -> str:
+        loaded = sum(1 for shard in self.shards.values() if shard.config_map != None)
+        return f"<DictionaryRegistry Object> Dictionaries: {len(self.dictionaries)}, Shards: {loaded}/{len(self.shards)} loaded"
+
+    def register(self, name: str, possible_word_list: list[str], accepted_word_list: list[str] = None,
+                 path_to_config: str = None) -> list[int]:
+        '''Adds a dictionary (replacing any of the same 'name'), and returns its word lengths. Nothing is loaded yet.
+        Accepted words of lengths without possible words are ignored.
+
+        With a 'path_to_config', the dictionary is cached at that path instead of in the cache directory, with the
+        words of other lengths than WORD_SIZE beside it (see length_path). The default dictionary is cached at
+        DEFAULT_CONFIG_MAP in the cache directory unless given one, so that it shares its cache with the other tools.'''
+        possible_by_length = split_by_length(possible_word_list)
+        accepted_by_length = split_by_length(accepted_word_list) if accepted_word_list != None else possible_by_length
+        if len(possible_by_length) == 0:
+            raise Exception(f"<DictionaryRegistry>: Dictionary {name!r} has no words")
+        if path_to_config == None and name == DEFAULT_DICTIONARY:
+            path_to_config = os.path.join(self.cache_dir, DEFAULT_CONFIG_MAP)
+
+        lengths = {}
+        with self.lock:
+            for length, possible_words in sorted(possible_by_length.items()):
+                accepted_words = accepted_by_length.get(length, possible_words)
+                shard = Shard(length, possible_words, accepted_words,
+                              length_path(path_to_config, length) if path_to_config != None else None)
+                if shard.path_to_config == None:
+                    shard.path_to_config = os.path.join(self.cache_dir,
+                        SHARD_FILE_NAME.format(length=length, hash=shard.hash[:SHARD_HASH_LENGTH]))
+                # An existing shard of the same words is kept, with its config map if loaded
+                lengths[length] = self.shards.setdefault(shard.key(), shard).key()
+            self.dictionaries[name] = lengths
+        return sorted(lengths)
+
+    def lengths(self, name: str = DEFAULT_DICTIONARY) -> list[int]:
+        return sorted(self.dictionary(name))
+
+    def dictionary(self, name: str) -> dict[int, tuple[int, str]]:
+        if name not in self.dictionaries:
+            raise Exception(f"<DictionaryRegistry>: Unknown dictionary {name!r}")
+        return self.dictionaries[name]
+
+    def shard(self, length: int = None, name: str = DEFAULT_DICTIONARY) -> Shard:
+        '''Returns the shard of 'length' letter words of a dictionary. The length may be left out for a dictionary of a single length.'''
+        keys = self.dictionary(name)
+        if length == None:
+            if len(keys) != 1:
+                raise Exception(f"<DictionaryRegistry>: Dictionary {name!r} has words of lengths {sorted(keys)}, choose one")
+            length = next(iter(keys))
+        if length not in keys:
+            raise Exception(f"<DictionaryRegistry>: Dictionary {name!r} has no words of {length} letters")
+        return self.shards[ keys[length] ]
+
+    def configMap(self, length: int = None, name: str = DEFAULT_DICTIONARY) -> ConfigMap:
+        '''Returns the config map of a shard, loading it (and unloading idle shards over the memory cap) if needed.'''
+        return self.load( self.shard(length, name) ).config_map
+
+    def load(self, shard: Shard) -> Shard:
+        with self.lock:
+            shard.last_used = time.monotonic()
+            if shard.config_map == None:
+                self.evict( shard.size(), keep=shard )
+                with metrics.timer("DictionaryRegistry.load"):
+                    shard.config_map = ConfigMap(shard.path_to_config, shard.possible_words, shard.accepted_words,
+                                                 workers=self.workers)
+                self.loads += 1
+                metrics.count("dictionary_shard_loads")
+            return shard
+
+    def createPuzzle(self, mode: str, length: int = None, no_of_games: int = 1, name: str = DEFAULT_DICTIONARY, **options):
+        '''Returns a new puzzle of the given 'mode' over the words of 'length' letters of a dictionary
+        (see simulate.create_puzzle for the 'options').'''
+        from simulate import create_puzzle
+
+        with self.lock:
+            shard = self.load( self.shard(length, name) )
+            wordle_puzzle = create_puzzle(shard.config_map, shard.possible_words, mode, no_of_games, **options)
+            shard.puzzles.add(wordle_puzzle)
+        return wordle_puzzle
+
+    def memoryUsed(self) -> int:
+        '''Returns the bytes taken by the config maps loaded.'''
+        return sum(shard.size() for shard in self.shards.values() if shard.config_map != None)
+
+    def evict(self, needed: int = 0, keep: Shard = None) -> int:
+        '''Unloads the least recently used idle shards until 'needed' more bytes fit under the memory cap.
+        Shards still used by a puzzle are never unloaded, so the cap may be exceeded while they are in use.
+        Returns the number of shards unloaded.'''
+        if self.memory_cap == None:
+            return 0
+        evicted = 0
+        with self.lock:
+            idle = sorted((shard for shard in self.shards.values()
+                           if shard.config_map != None and shard is not keep and shard.isIdle()),
+                          key=lambda shard: shard.last_used)
+            used = self.memoryUsed()
+            for shard in idle:
+                if used + needed <= self.memory_cap:
+                    break
+                used -= shard.size()
+                shard.config_map.release()
+                shard.config_map = None
+                evicted += 1
+            self.evictions += evicted
+        metrics.count("dictionary_shard_evictions", evicted)
+        return evicted
+
+    def stats(self) -> dict:
+        with self.lock:
+            shards = [{"length": shard.length, "hash": shard.hash[:SHARD_HASH_LENGTH], "loaded": shard.config_map != None,
+                       "bytes": shard.size(), "puzzles": len(shard.puzzles)} for shard in self.shards.values()]
+            return {"dictionaries": {name: sorted(keys) for name, keys in self.dictionaries.items()}, "shards": shards,
+                    "memory_used": self.memoryUsed(), "memory_cap": self.memory_cap,
+                    "loads": self.loads, "evictions": self.evictions}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the config map of every word length of a dictionary, and reports its shards.")
+    parser.add_argument("--possible", default="wordle_words.txt")
+    parser.add_argument("--accepted", default="all_words.txt")
+    parser.add_argument("--cache-dir", default=".")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    registry = DictionaryRegistry(args.cache_dir, workers=args.workers)
+    for word_length in registry.register(DEFAULT_DICTIONARY, load_wordlist(args.possible), load_wordlist(args.accepted)):
+        registry.configMap(word_length)
+    print(json.dumps(registry.stats(), indent=1))
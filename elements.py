@@ -1,15 +1,68 @@
 
-import os
-import math
-import pickle
+import numpy as np
+
+import cache
+import metrics
 
 WORD_SIZE = 5
 GREEN = 1
 YELLOW = 2
 GRAY = 3
 
+COLOR_NAMES = {GREEN: "GREEN", YELLOW: "YELLOW", GRAY: "GRAY"}
+
+def config_to_code(config: tuple) -> int:
+    '''Packs a configuration tuple into a base-3 integer, with the first letter as the most significant digit.
+    GRAY is stored as 0 so that an all GRAY configuration has the code 0.'''
+    code = 0
+    for color in config:
+        code = code * 3 + color % 3
+    return code
+
+def code_to_config(code: int, size: int = WORD_SIZE) -> tuple:
+    '''Unpacks a base-3 integer code into a configuration tuple.'''
+    colors = []
+    for _ in range(size):
+        code, digit = divmod(code, 3)
+        colors.append(digit if digit != 0 else GRAY)
+    return tuple(reversed(colors))
+
+def complete_code(size: int = WORD_SIZE) -> int:
+    '''Returns the code of the all GREEN configuration.'''
+    return (3 ** size - 1) // 2
+
+def code_dtype(size: int = WORD_SIZE) -> np.dtype:
+    '''Returns the smallest unsigned integer type that holds the codes of 'size' letter configurations,
+    'uint8' up to five letters and 'uint16' up to ten.'''
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if 3 ** size <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    raise Exception("<Configuration>: Words are too long")
+
+def feedback_code(mystery_word: str, check_word: str) -> int:
+    '''Returns the code of the configuration that would be generated if the answer to the puzzle was 'mystery_word'
+    and the user entered 'check_word'. The letters of the mystery_word that are not GREEN are counted once, and
+    a letter of the check_word is YELLOW while unmatched copies of it remain.'''
+    unmatched = {}
+    for check_char, mystery_char in zip(check_word, mystery_word):
+        if check_char != mystery_char:
+            unmatched[mystery_char] = unmatched.get(mystery_char, 0) + 1
+
+    code = 0
+    for check_char, mystery_char in zip(check_word, mystery_word):
+        code *= 3
+        if check_char == mystery_char:
+            code += GREEN
+        elif unmatched.get(check_char):
+            unmatched[check_char] -= 1
+            code += YELLOW
+    return code
+
 class Configuration():
-    '''Represents a possible response for an entered WORD in the puzzle'''
+    '''Represents a possible response for an entered WORD in the puzzle.
+    The colors are held as a single base-3 code (see config_to_code), along with the number of letters.'''
+    __slots__ = ("code", "size")
+
     def __init__(self, *args) -> None:
         ''' This object can be initialized in multiple ways
         1: Configuration(): This will return a dufault all GRAY configuration.
@@ -19,191 +72,431 @@ class Configuration():
         '''
         # 1. Configuration()
         if len(args) == 0:
-            self.colors = [GRAY,GRAY,GRAY,GRAY,GRAY]
+            self.code = 0
+            self.size = WORD_SIZE
         # 2. Configuration(config_str: str)
         elif len(args) == 1 and isinstance( args[0], str ): 
             config_string = args[0]
-            self.colors = []
-            self.colors.append( int(config_string[0]) )
-            self.colors.append( int(config_string[1]) )
-            self.colors.append( int(config_string[2]) )
-            self.colors.append( int(config_string[3]) )
-            self.colors.append( int(config_string[4]) )
+            # Performing a check to test the validity of the configuration
+            if len(config_string) == 0 or config_string.strip("123") != "":
+                raise Exception("<Configuration>: Invalid configuration in __init__")
+            self.code = config_to_code( int(char) for char in config_string )
+            self.size = len(config_string)
         # 3. Configuration(mystery_word: str, check_word: str)
         elif len(args) == 2 and isinstance( args[0], str ) and isinstance( args[1], str ):
-            mystery_word = args[0]
-            check_word = args[1]
-
-            self.colors = [GRAY,GRAY,GRAY,GRAY,GRAY]
-            # For loop to check the Green Condition
-            for char_pos, char in enumerate(check_word):
-                if check_word[char_pos] != mystery_word[char_pos]:
-                    continue
-                
-                self.colors[char_pos] = GREEN
-                check_word = check_word[: char_pos] + "_" + check_word[char_pos+1:]
-                mystery_word = mystery_word[: char_pos] + "_" + mystery_word[char_pos+1:]
-            
-            # For loop to check the Yellow Condition
-            for char_pos, char in enumerate(check_word):
-                if char == "_":
-                    continue
-                if check_word[char_pos] not in mystery_word:
-                    continue
-
-                self.colors[char_pos] = YELLOW
-
-                mystery_char_pos = mystery_word.find( check_word[char_pos] )
-                check_word = check_word[: char_pos] + "_" + check_word[char_pos+1:]
-                mystery_word = mystery_word[: mystery_char_pos] + "_" + mystery_word[mystery_char_pos+1:]
-
-        # Performing a check to test the validity of the configuration
-        for color in self.colors:
-            if color in [GREEN, YELLOW, GRAY]:
-                continue                
-            raise Exception("<Configuration>: Invalid configuration in __init__")
+            self.code = feedback_code( args[0], args[1] )
+            self.size = len(args[1])
+        else:
+            raise Exception("<Configuration>: Invalid arguments in __init__")
+
+    @staticmethod
+    def from_code(code: int, size: int = WORD_SIZE) -> "Configuration":
+        '''Creates a Configuration Object from a base-3 code.'''
+        if code < 0 or code >= 3 ** size:
+            raise Exception("<Configuration>: Invalid configuration code")
+        configuration = Configuration.__new__(Configuration)
+        configuration.code = int(code)
+        configuration.size = size
+        return configuration
+
+    @staticmethod
+    def from_config(config: tuple) -> "Configuration":
+        '''Creates a Configuration Object from a tuple of colors.'''
+        return Configuration( "".join(str(color) for color in config) )
 
     def __str__(self) -> str:
-        config_string = "("
-        for c in self.colors:
-            if c == GREEN:
-                config_string += " GREEN,"
-            elif c == YELLOW:
-                config_string += " YELLOW,"
-            else:
-                config_string += " GRAY,"
-        config_string += ")"
-        return config_string
+        return "(" + "".join(f" {COLOR_NAMES[color]}," for color in self.get_config()) + ")"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Configuration) and self.code == other.code and self.size == other.size
+
+    def __hash__(self) -> int:
+        return hash((self.code, self.size))
+
+    @property
+    def colors(self) -> list[int]:
+        '''The configuration as a list of colors.'''
+        return list(self.get_config())
     
     def get_config(self) -> tuple:
         '''Returns the configuration in Tuple Format'''
-        return tuple(self.colors)
+        return code_to_config(self.code, self.size)
+
+    def get_config_string(self) -> str:
+        '''Returns the configuration in String Format, eg: "11233"'''
+        return "".join(str(color) for color in self.get_config())
     
+    def get_code(self) -> int:
+        '''Returns the configuration as a base-3 integer code'''
+        return self.code
+
     def isComplete(self) -> bool:
         '''Checks the configuration is all GREEN'''
-        if self.get_config() == (GREEN,GREEN,GREEN,GREEN,GREEN):
-            return True
-        return False
+        return self.code == complete_code(self.size)
  
+# A cached config map is updated in place of a full rebuild while at most this fraction of its cells are new
+MAX_UPDATE_FRACTION = 0.5
+
 class ConfigMap():
     '''
     Represents a lookup-table that related words to other words based on the 
-    configuration that would be generated
+    configuration that would be generated.
+
+    The table is held as a dense matrix of shape (accepted words, possible words), where each cell is the
+    base-3 code of the configuration (see config_to_code), of the smallest type that holds it (see code_dtype).
+    Every word of a config map has the same number of letters.
     '''
-    def __init__(self, path_to_config: str, possible_word_list: list[str] = None, accepted_word_list: list[str] = None) -> None:
+    @metrics.timed("ConfigMap.load")
+    def __init__(self, path_to_config: str, possible_word_list: list[str] = None, accepted_word_list: list[str] = None,
+                 workers: int = None, progress = None) -> None:
         ''' We will look at 'path_to_config' to check if the config map has been precomputed:
-        If it is precomputed, then load it to the object.
-        If not, then compute the config map.
+        If it is precomputed from the same word lists, then memory-map it to the object.
+        If not, then compute the config map, spread over 'workers' processes, reporting to 'progress(done, total)'.
         '''
-        # If the configuration map is already obtained
-        if os.path.isfile( path_to_config ):
-            a_file = open(path_to_config, "rb")
-            self.config_map = pickle.load(a_file)
-            return
+        if possible_word_list != None and accepted_word_list == None:
+            accepted_word_list = possible_word_list
+        # Files made for the map, such as its opening books, are stored beside it
+        self.path_to_config = path_to_config
+
+        # If the configuration map is already obtained, and was built from the same word lists
+        cached = cache.read_cache( path_to_config )
+        if cached != None:
+            header, matrix = cached
+            if possible_word_list == None or cache.matches(header, possible_word_list, accepted_word_list):
+                self.setTables(header["possible"], header["accepted"], matrix)
+                return
+            # The word lists of the cache tell which words it covers, so only the changed words are computed
+            if self.updateConfigMap(header, matrix, possible_word_list, accepted_word_list, path_to_config):
+                return
+            # The stale cache is rebuilt in its place, which Windows only allows once it is unmapped
+            cache.close_cache(matrix)
 
         # Else lets loop through all the words to find the configuration map and save the map
         if possible_word_list == None:
             raise Exception("<ConfigMap>: Unable to create configuration map without a list of possible words")
-        if accepted_word_list == None:
-            accepted_word_list = possible_word_list
 
-        self.createConfigMap(possible_word_list, accepted_word_list)
-    
-        # Store the computed config map to reduce time on later runs
-        a_file = open(path_to_config, "wb")
-        pickle.dump(self.config_map, a_file)
-        a_file.close()
+        # The computed config map is stored to reduce time on later runs
+        self.createConfigMap(possible_word_list, accepted_word_list, path_to_config, workers, progress)
+
+    @metrics.timed("ConfigMap.build")
+    def createConfigMap(self, possible_word_list: list[str], accepted_word_list: list[str], path_to_config: str = None,
+                        workers: int = None, progress = None) -> None:
+        '''Computes the config map. If 'path_to_config' is given, the matrix is written straight into that cache file.'''
+        # Imported here as the build module itself depends on this one
+        import build
+
+        if len({len(word) for word in possible_word_list + accepted_word_list}) > 1:
+            raise Exception("<ConfigMap>: Words of a config map must all have the same number of letters")
+        if progress == None:
+            progress = build.ProgressReporter("<ConfigMap>: Processing words")
+
+        # check_word x mystery_word -> config code
+        if path_to_config == None:
+            matrix = build.build_matrix(possible_word_list, accepted_word_list, workers=workers, progress=progress)
+            self.setTables(possible_word_list, accepted_word_list, matrix)
+            return
+
+        dtype = code_dtype(len(possible_word_list[0])) if len(possible_word_list) != 0 else code_dtype()
+        temp_path, matrix = cache.open_cache_for_writing(path_to_config, possible_word_list, accepted_word_list, dtype)
+        build.build_matrix(possible_word_list, accepted_word_list, out=matrix, workers=workers, progress=progress)
+        cache.commit_cache(temp_path, path_to_config, matrix)
+
+        header, matrix = cache.read_cache(path_to_config)
+        self.setTables(header["possible"], header["accepted"], matrix)
+
+    @metrics.timed("ConfigMap.update")
+    def updateConfigMap(self, header: dict, matrix: np.ndarray, possible_word_list: list[str], accepted_word_list: list[str],
+                        path_to_config: str) -> bool:
+        '''Updates a cached config map to new word lists, computing only the rows and columns of words it does not cover,
+        and rewrites the cache. Returns False if too much of the matrix would be new for this to pay off.'''
+        import build
 
-    def createConfigMap(self, possible_word_list: list[str], accepted_word_list: list[str]) -> None:
-        # check_word -> config -> set of mystery_word
-        self.config_map = {} 
+        old_possible, old_accepted = header["possible"], header["accepted"]
+        if len(possible_word_list) == 0 or len(accepted_word_list) == 0 or len(old_possible) == 0 or \
+                len(possible_word_list[0]) != len(old_possible[0]) or \
+                len({len(word) for word in possible_word_list + accepted_word_list}) > 1:
+            return False
+        new_cells = build.uncovered_cells(old_possible, old_accepted, possible_word_list, accepted_word_list)
+        if new_cells > MAX_UPDATE_FRACTION * len(possible_word_list) * len(accepted_word_list):
+            return False
 
-        for i, check_word in enumerate(accepted_word_list):
-            print( f"Processing word {i}..." )
-            for mystery_word in possible_word_list:
+        temp_path, out = cache.open_cache_for_writing(path_to_config, possible_word_list, accepted_word_list, matrix.dtype)
+        build.update_matrix(old_possible, old_accepted, matrix, possible_word_list, accepted_word_list, out=out)
+        cache.close_cache(matrix)
+        cache.commit_cache(temp_path, path_to_config, out)
 
-                configuration = Configuration(mystery_word, check_word)
+        header, matrix = cache.read_cache(path_to_config)
+        self.setTables(header["possible"], header["accepted"], matrix)
+        return True
 
-                if check_word not in self.config_map:
-                    self.config_map[check_word] = {}
-                if configuration.get_config() not in self.config_map[check_word]:
-                    self.config_map[check_word][configuration.get_config()] = set()
-                self.config_map[check_word][configuration.get_config()].add( mystery_word )
-                    
+    def setTables(self, possible_word_list: list[str], accepted_word_list: list[str], matrix: np.ndarray) -> None:
+        '''Sets the config matrix and builds the word -> index tables for both axes.'''
+        self.possible_words = list(possible_word_list)
+        self.accepted_words = list(accepted_word_list)
+        self.matrix = matrix
+        self.extra_rows = {}
+        self.accepted_letters = None
+        # mode -> OpeningBook, loaded on first use
+        self.opening_books = {}
+        self.word_size = len(self.possible_words[0]) if len(self.possible_words) != 0 else WORD_SIZE
+        self.no_of_codes = 3 ** self.word_size
+
+        self.possible_index = {word: index for index, word in enumerate(self.possible_words)}
+        self.accepted_index = {word: index for index, word in enumerate(self.accepted_words)}
+        # accepted index -> possible index, or -1 if the accepted word can never be the answer
+        self.accepted_to_possible = np.array(
+            [self.possible_index.get(word, -1) for word in self.accepted_words], dtype=np.int32)
+
+    def publish(self) -> str:
+        '''Copies the config map into shared memory, and returns the name that other processes attach to it with.
+        Call release() once they are done.'''
+        if getattr(self, "shared_memory", None) == None:
+            self.shared_memory = cache.publish_shared(self.possible_words, self.accepted_words, self.matrix)
+            self.shared_owner = True
+        return self.shared_memory.name
+
+    @staticmethod
+    def attach(name: str) -> "ConfigMap":
+        '''Returns a config map that reads the matrix published by another process under 'name', without copying it.'''
+        shared_memory, header, matrix = cache.attach_shared(name)
+        config_map = ConfigMap.__new__(ConfigMap)
+        # Without a file of its own, the map keeps its opening books in memory
+        config_map.path_to_config = None
+        config_map.setTables(header["possible"], header["accepted"], matrix)
+        config_map.shared_memory = shared_memory
+        config_map.shared_owner = False
+        return config_map
+
+    def release(self) -> None:
+        '''Detaches from the shared memory, and frees it if this config map published it.'''
+        shared_memory = getattr(self, "shared_memory", None)
+        if shared_memory == None:
+            return
+        self.shared_memory = None
+        if not self.shared_owner:
+            # The matrix is a view of the block, which must be dropped before closing it
+            self.matrix = np.array(self.matrix)
+        shared_memory.close()
+        if self.shared_owner:
+            shared_memory.unlink()
+
+    def wordListHashes(self) -> tuple[str, str]:
+        '''Returns the hashes of the possible and accepted word lists, which identify the data the map was built from.'''
+        if not hasattr(self, "word_list_hashes"):
+            self.word_list_hashes = (cache.word_list_hash(self.possible_words), cache.word_list_hash(self.accepted_words))
+        return self.word_list_hashes
 
     def get_config_map(self) -> dict[str, dict[tuple, set]]:
-        '''Returns the complete config map.'''
-        return self.config_map
+        '''Returns the complete config map. This expands the whole matrix and is only meant for inspection.'''
+        return {word: self.word(word) for word in self.accepted_words}
+
+    def wordIndex(self, word: str) -> int:
+        '''Returns the row of 'word' in the config matrix.'''
+        if word not in self.accepted_index:
+            raise Exception("<ConfigMap>: Invalid word")
+        return self.accepted_index[word]
+
+    def wordRow(self, word: str) -> np.ndarray:
+        '''Returns the config codes 'word' generates against every possible mystery_word.
+        Words outside the accepted list (such as possible words that are not accepted) are computed on demand.'''
+        if word in self.accepted_index:
+            return self.matrix[self.accepted_index[word]]
+        if word not in self.extra_rows:
+            if len(word) != self.word_size or not word.isascii() or not word.isalpha():
+                raise Exception("<ConfigMap>: Invalid word")
+            # Imported here as the build module itself depends on this one
+            import build
+            self.extra_rows[word] = build.feedback_block( build.encode_words([word]), build.encode_words(self.possible_words) )[0]
+        return self.extra_rows[word]
+
+    def acceptedLetters(self) -> tuple[np.ndarray, np.ndarray]:
+        '''Returns the letters of every accepted word as a (words, positions) array of character codes,
+        and the number of times each letter 'a'-'z' appears in them as a (words, 26) array.'''
+        if self.accepted_letters is None:
+            import build
+            letters = build.encode_words(self.accepted_words)
+            counts = np.zeros((len(self.accepted_words), 26), dtype=np.uint8)
+            for position in range(letters.shape[1]):
+                np.add.at(counts, (np.arange(len(letters)), letters[:, position].astype(np.intp) - ord("a")), 1)
+            self.accepted_letters = (letters, counts)
+        return self.accepted_letters
 
     def word(self, word: str) -> dict[tuple, set[str]]:
         '''Returns all possible configs that 'word' can generate, and the mystery_words associated with each config.'''
-        if word not in self.config_map:
-            raise Exception("<ConfigMap>: Invalid word")
-        return self.config_map[word]
+        word_config_map = {}
+        for mystery_index, code in enumerate(self.wordRow(word).tolist()):
+            config = code_to_config(code, self.word_size)
+            if config not in word_config_map:
+                word_config_map[config] = set()
+            word_config_map[config].add( self.possible_words[mystery_index] )
+        return word_config_map
 
     def word_config(self, word: str, config: tuple) -> set[str]:
         '''Returns the set of mystery_words that satisfy a given 'word' and 'config'.'''
-        word_config_map = self.word(word)
-        if config not in word_config_map:
+        matches = np.flatnonzero( self.wordRow(word) == config_to_code(config) )
+        if len(matches) == 0:
             raise Exception("<ConfigMap>: Invalid word-config pair")
-        return word_config_map[config]
+        return {self.possible_words[index] for index in matches.tolist()}
 
 class WordSet():
-    '''Represents the sample space of possible answers to the puzzle.'''
-    def __init__(self, word_list: list[str]) -> None:
+    '''Represents the sample space of possible answers to the puzzle.
+
+    The set is held as a boolean mask over the possible words of the config map, so that a reduction is
+    an in-place AND with the matching cells of a config matrix row, and the size is a popcount.
+    '''
+    def __init__(self, word_list: list[str], config_map: ConfigMap) -> None:
         '''Create a set with a list of all possible answers.'''
-        self.word_set = set(word_list)
+        self.config_map = config_map
+        self.mask = np.zeros(len(config_map.possible_words), dtype=bool)
+        try:
+            self.mask[ [config_map.possible_index[word] for word in word_list] ] = True
+        except KeyError:
+            raise Exception("<WordSet>: Word list contains words that are missing from the config map")
+        # Scratch space for reductions, so that they do not allocate
+        self.matching = np.empty_like(self.mask)
+        self.count = int(np.count_nonzero(self.mask))
+        self.indices = None
     
     def __str__(self) -> str:
-        return f"<Word Set Object> Size: {len(self.word_set)}"
+        return f"<Word Set Object> Size: {self.size()}"
     
     def size(self) -> int:
         '''Return the number of possible answers.'''
-        return len(self.word_set)
+        return self.count
     
     def pop(self) -> str:
         '''Return the set of possible answers.'''
-        return next(iter(self.word_set))
+        return self.config_map.possible_words[ self.getIndices()[0] ]
+
+    def getIndices(self) -> np.ndarray:
+        '''Returns the indices of the possible answers in the config map, in increasing order.'''
+        if self.indices is None:
+            self.indices = np.flatnonzero(self.mask)
+        return self.indices
 
+    @metrics.timed("reduceWordSet", traced=True)
     def reduceWordSet(self, my_word: str, config_map: ConfigMap, configuration: Configuration) -> None:
         '''
         Reduce the set of possible answers once we make a guess(my_word) and recieve
         feedback on the guess(configuration).
         '''
-        set_to_intersect = config_map.word_config(my_word, configuration.get_config())
-        self.word_set = self.word_set.intersection( set_to_intersect )
-        if len(self.word_set) == 0:
+        row = config_map.wordRow(my_word)
+        np.equal(row, configuration.get_code(), out=self.matching)
+        np.logical_and(self.mask, self.matching, out=self.mask)
+        self.count = int(np.count_nonzero(self.mask))
+        self.indices = None
+        if metrics.enabled:
+            metrics.note(word=my_word, config=configuration.get_config_string(), remaining=self.count)
+        if self.count == 0:
             raise Exception("<WordSet>: No Words match the word-config pairs entered")
     
+    def hasMatch(self, my_word: str, config_map: ConfigMap, configuration: Configuration) -> bool:
+        '''Checks if any possible answer would give 'configuration' to 'my_word', ie if reduceWordSet would leave words.'''
+        return bool( np.any(config_map.wordRow(my_word)[self.getIndices()] == configuration.get_code()) )
+
     def fraction(self, set: set[str]) -> float:
         '''Returns the fraction of possible answers that are in 'set' to the total possible answers.'''
-        return float(len(self.word_set.intersection( set ))) / len(self.word_set)
+        count = sum(1 for word in set if self.hasWord(word))
+        return float(count) / self.size()
     
+    @metrics.timed("expectedBitsInWord")
     def expectedBitsInWord( self, config_map: ConfigMap, my_word: str ) -> float:
         '''Returns the expected bits(information) that can be provided by a given 'my_word'.'''
-        # Using a concept from information theory: bits
-        # Where bits = - logbase2( probability )
-        # And the expected bits = Summation( probabilty * bits )
-        expected_bits = 0.0
-        for config in config_map.word( my_word ):
-
-            probability = self.fraction( config_map.word_config(my_word, config) )
-            
-            bits = 0.0
-            if probability != 0:
-                bits = -math.log2(probability)
-
-            expected_bits += probability * bits
-
-        return expected_bits
-
-    # def findBestPair(self, config_map: ConfigMap):
-    #     expected_bits = 0.0
-    #     highest_bit = 0.0
-    #     for config in config_map.word( my_word ):
-    #         pass
+        return self.expectedBitsInRow( config_map.wordRow(my_word) )
+
+    def expectedBitsInRow( self, row: np.ndarray ) -> float:
+        '''Returns the expected bits(information) of a guess, given its row in the config matrix.'''
+        counts = np.bincount( row[self.getIndices()], minlength=self.config_map.no_of_codes )
+        return float( bits_from_counts(counts, self.size()) )
+
+    @metrics.timed("expectedBitsForAll")
+    def expectedBitsForAll( self, config_map: ConfigMap, word_indices: np.ndarray = None ) -> np.ndarray:
+        '''Returns the expected bits(information) of every accepted word, or of the accepted words at 'word_indices'.'''
+        return expected_bits( config_map, self.getIndices(), word_indices )
+
     def hasWord(self, word: str) -> bool:
-        return word in self.word_set
+        index = self.config_map.possible_index.get(word)
+        if index is None:
+            return False
+        return self.hasIndex(index)
+
+    def hasIndex(self, index: int) -> bool:
+        '''Checks if the possible word at 'index' is still a possible answer.'''
+        return index >= 0 and bool(self.mask[index])
+
+# Largest number of bins counted by a single bincount, which bounds the words scored at a time for long words
+MAX_CHUNK_BINS = 2 ** 22
+
+def chunk_rows(no_of_bins: int, chunk_size: int) -> int:
+    '''Returns the number of words, at most 'chunk_size', whose 'no_of_bins' config counts each fit a single bincount.'''
+    return max(1, min(chunk_size, MAX_CHUNK_BINS // no_of_bins))
+
+# Scale of the fixed point values of count * log2(count) summed by bits_from_counts
+FIXED_POINT_SCALE = 2 ** 32
+xlog2x_table = np.zeros(1, dtype=np.int64)
+
+def bits_from_counts(counts: np.ndarray, total) -> np.ndarray:
+    '''Returns the entropy of each row of config counts (the last axis) of a set of 'total' words.'''
+    # Using a concept from information theory: bits
+    # Where bits = - logbase2( probability )
+    # And the expected bits = Summation( probabilty * bits ) = logbase2( total ) - Summation( count * logbase2( count ) ) / total
+    # The summation is done over fixed point integers, so that it does not depend on the order of the counts,
+    # and words that split the set into equal sized parts score exactly equal
+    global xlog2x_table
+    largest = int(counts.max()) if counts.size != 0 else 0
+    if largest >= len(xlog2x_table):
+        values = np.arange(max(largest + 1, 2 * len(xlog2x_table)), dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xlog2x_table = np.rint( np.where(values > 0, values * np.log2(values), 0.0) * FIXED_POINT_SCALE ).astype(np.int64)
+    summation = xlog2x_table[counts].sum(axis=-1)
+    return np.log2(total) - summation / (np.asarray(total, dtype=np.float64) * FIXED_POINT_SCALE)
+
+def expected_bits(config_map: ConfigMap, mystery_indices: np.ndarray, word_indices: np.ndarray = None) -> np.ndarray:
+    '''Returns the expected bits of every accepted word (or those at 'word_indices') over the mystery words at 'mystery_indices'.'''
+    return expected_bits_sum(config_map, [mystery_indices], word_indices)
+
+@metrics.timed("expected_bits_sum")
+def expected_bits_sum(config_map: ConfigMap, mystery_index_sets: list[np.ndarray], word_indices: np.ndarray = None,
+                      chunk_size: int = 1024, bias_correction: bool = False) -> np.ndarray:
+    '''Returns the expected bits of every accepted word (or those at 'word_indices'), summed over several sets of
+    mystery words, such as the games of a WordleMultiPuzzle. The configs of a chunk of words in every set are
+    counted with a single bincount, by offsetting the codes of each word and set.
+
+    When the sets are samples of larger sets, 'bias_correction' adds the Miller-Madow correction to each estimate.'''
+    no_of_codes = config_map.no_of_codes
+    if word_indices is None:
+        word_indices = np.arange(len(config_map.accepted_words))
+    bits = np.zeros(len(word_indices), dtype=np.float64)
+
+    # Identical sets (such as every game at the start) are only counted once
+    weights = {}
+    for indices in mystery_index_sets:
+        if len(indices) != 0:
+            key = indices.tobytes()
+            weights[key] = weights.get(key, 0) + 1
+    if len(weights) == 0:
+        return bits
+    mystery_index_sets = [np.frombuffer(key, dtype=mystery_index_sets[0].dtype) for key in weights]
+    weights = np.array(list(weights.values()), dtype=np.float64)
+
+    no_of_sets = len(mystery_index_sets)
+    mystery_indices = np.concatenate(mystery_index_sets)
+    totals = np.array([len(indices) for indices in mystery_index_sets])
+    set_offsets = np.repeat(np.arange(no_of_sets, dtype=np.int32) * no_of_codes, totals)
+    no_of_bins = no_of_sets * no_of_codes
+    chunk_size = chunk_rows(no_of_bins, chunk_size)
+
+    for start in range(0, len(word_indices), chunk_size):
+        rows = word_indices[start:start + chunk_size]
+        codes = config_map.matrix[rows][:, mystery_indices].astype(np.int32)
+        codes += set_offsets
+        codes += np.arange(len(rows), dtype=np.int32)[:, None] * no_of_bins
+        counts = np.bincount(codes.ravel(), minlength=len(rows) * no_of_bins).reshape(len(rows), no_of_sets, no_of_codes)
+        set_bits = bits_from_counts(counts, totals)
+        if bias_correction:
+            set_bits += (np.count_nonzero(counts, axis=-1) - 1) / (2 * totals * np.log(2))
+        bits[start:start + len(rows)] = set_bits @ weights
+    return bits
 
 def load_wordlist(path_to_file: str) -> list[str]:
     '''Loads the list of words to the program.'''
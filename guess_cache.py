@@ -0,0 +1,119 @@
+
+import os
+import json
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from elements import ConfigMap
+from search import fingerprint
+
+DEFAULT_MAX_SIZE = 100000
+
+class GuessCache():
+    '''
+    Least recently used cache of the best word for a state of a puzzle, keyed by the mode of the puzzle,
+    the fingerprints of its sets of possible answers and its Hard Mode rules.
+
+    With a 'path', the cache is loaded from that file, and saved to it after every 'autosave' new entries.
+    Saving merges with the entries already in the file, so that several processes can share it.
+    With 'track_new', the keys put are also kept until takeNew(), so that a worker process can hand its
+    new entries to the process that saves them.
+    '''
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, path: str = None, autosave: int = None, track_new: bool = False) -> None:
+        self.max_size = max_size
+        self.path = path
+        self.autosave = autosave
+        self.entries: OrderedDict[str, list] = OrderedDict()
+        self.new_keys = [] if track_new else None
+        self.unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        if path != None and os.path.isfile(path):
+            self.entries.update( self.read(path) )
+            self.trim()
+
+    def __str__(self) -> str:
+        return f"<GuessCache Object> Size: {len(self.entries)}, Hits: {self.hits}, Misses: {self.misses}"
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def key(mode: str, config_map: ConfigMap, mystery_index_sets: list[np.ndarray], constraints: tuple = None) -> str:
+        '''Returns the key of a puzzle state. The word lists are part of it, so entries never outlive a word list change.'''
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update( "|".join([mode, *config_map.wordListHashes(), repr(constraints)]).encode() )
+        for mystery_indices in mystery_index_sets:
+            digest.update( fingerprint(mystery_indices) )
+        return digest.hexdigest()
+
+    def get(self, key: str) -> list:
+        '''Returns the entry stored for 'key', or None.'''
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: list) -> None:
+        '''Stores an entry (a list of JSON values) for 'key', evicting the least recently used ones beyond the maximum size.'''
+        self.entries[key] = list(entry)
+        self.entries.move_to_end(key)
+        self.trim()
+        if self.new_keys is not None:
+            self.new_keys.append(key)
+        self.unsaved += 1
+        if self.path != None and self.autosave != None and self.unsaved >= self.autosave:
+            self.save()
+
+    def takeNew(self) -> dict[str, list]:
+        '''Returns the entries put since the last call that are still cached, with 'track_new'.'''
+        if self.new_keys is None:
+            return {}
+        new_entries = {key: self.entries[key] for key in self.new_keys if key in self.entries}
+        self.new_keys = []
+        return new_entries
+
+    def merge(self, entries: dict[str, list]) -> None:
+        '''Adds the entries found by another process, such as those returned by its takeNew().'''
+        for key, entry in entries.items():
+            self.entries[key] = list(entry)
+            self.entries.move_to_end(key)
+        self.trim()
+        self.unsaved += len(entries)
+
+    def trim(self) -> None:
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups != 0 else 0.0}
+
+    @staticmethod
+    def read(path: str) -> dict:
+        try:
+            with open(path, "r") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, path: str = None) -> None:
+        '''Merges the entries into the file at 'path' (the cache's own path by default).'''
+        path = path or self.path
+        if path is None:
+            raise Exception("<GuessCache>: No path to save the cache to")
+        merged = self.read(path) if os.path.isfile(path) else {}
+        merged.update(self.entries)
+        entries = list(merged.items())[-self.max_size:]
+
+        temp_path = f"{path}.tmp{os.getpid()}"
+        with open(temp_path, "w") as cache_file:
+            json.dump(dict(entries), cache_file)
+        os.replace(temp_path, path)
+        self.unsaved = 0
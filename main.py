@@ -1,24 +1,85 @@
 
-from elements import load_wordlist, ConfigMap
-from puzzle import WordlePuzzle, WordleHardPuzzle, WordleMultiPuzzle
-from UI import TerminalUI
-from UI_web import WordleBrowserUI, DordleBrowserUI
+import time
+START_TIME = time.perf_counter()
+
+import sys
+import json
+import argparse
+
+import metrics
+from simulate import NORMAL_MODE, HARD_MODE, MULTI_MODE
 
 # Wordle Browser Constants
-CONFIGURATION_MAP_PATH = "wordle_data.pkl"
 POSSIBLE_WORD_LIST_PATH = "wordle_words.txt"
 ACCEPTED_WORD_LIST_PATH = "all_words.txt"
 
+UI_BACKENDS = ("terminal", "oracle", "wordle", "dordle")
+
+def load_ui(backend: str) -> type:
+    '''Returns the UI class of 'backend'. The browser backends, and their dependencies, are only imported when selected.'''
+    if backend == "terminal":
+        from UI import TerminalUI
+        return TerminalUI
+    if backend == "oracle":
+        from UI import OracleUI
+        return OracleUI
+    try:
+        from UI_web import WordleBrowserUI, DordleBrowserUI
+    except ImportError as error:
+        raise Exception(f"<main>: The {backend} UI needs selenium and matplotlib ({error})")
+    return WordleBrowserUI if backend == "wordle" else DordleBrowserUI
+
+parser = argparse.ArgumentParser(description="Solves a Wordle puzzle, asking for the configuration of every word it enters.")
+parser.add_argument("mode", nargs="?", choices=[NORMAL_MODE, HARD_MODE, MULTI_MODE], default=NORMAL_MODE)
+parser.add_argument("games", nargs="?", type=int, default=2, help="number of simultaneous games in multi mode")
+parser.add_argument("--ui", choices=UI_BACKENDS, default="terminal")
+parser.add_argument("--url", default=None, help="page of a browser UI, such as wordle_standin.html?word=crane")
+parser.add_argument("--headless", action="store_true", help="run the browser of a browser UI without a window")
+parser.add_argument("--driver", default=None, metavar="PATH",
+                    help="chromedriver of a browser UI; without one, Selenium Manager may need the network to fetch a driver")
+parser.add_argument("--answers", nargs="+", default=None, help="answers the oracle UI gives the feedback of, one per game")
+parser.add_argument("--possible", default=POSSIBLE_WORD_LIST_PATH)
+parser.add_argument("--accepted", default=ACCEPTED_WORD_LIST_PATH)
+parser.add_argument("--length", type=int, default=None, help="number of letters, for word lists of several lengths")
+parser.add_argument("--cache-dir", default=".", help="directory of the config maps, wordle_data.bin and wordle_data_<length>.bin")
+parser.add_argument("--config-map", default=None,
+                    help="config map path of the five letter words, instead of wordle_data.bin in the cache directory; "
+                         "other lengths are cached beside it")
+parser.add_argument("--timing", action="store_true", help="report the import time and the time to the first word")
+parser.add_argument("--metrics", default=None, metavar="PATH", help="write the trace of the game and its timers and counters to this JSON file")
+parser.add_argument("--profile", choices=metrics.PROFILE_MODES, default=None,
+                    help=f"profile the solver with cProfile or tracemalloc (also set by {metrics.PROFILE_ENV})")
+
 if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.ui == "oracle" and args.answers == None:
+        parser.error("the oracle UI needs --answers")
+    if args.metrics != None:
+        metrics.enable()
 
-    possible_words = load_wordlist(POSSIBLE_WORD_LIST_PATH)
-    accepted_words = load_wordlist(ACCEPTED_WORD_LIST_PATH)
+    from elements import load_wordlist
+    from dictionary import DictionaryRegistry, DEFAULT_DICTIONARY
+    ui_class = load_ui(args.ui)
+    import_time = time.perf_counter() - START_TIME
 
-    configuration_map = ConfigMap(CONFIGURATION_MAP_PATH, possible_words, accepted_words)
+    # Only the config map of the chosen word length is loaded
+    registry = DictionaryRegistry(args.cache_dir)
+    registry.register(DEFAULT_DICTIONARY, load_wordlist(args.possible), load_wordlist(args.accepted), args.config_map)
+    wordle_puzzle = registry.createPuzzle(args.mode, args.length, args.games)
+    if args.ui == "terminal":
+        ui_element = ui_class(wordle_puzzle)
+    elif args.ui == "oracle":
+        ui_element = ui_class(wordle_puzzle, args.answers)
+    else:
+        ui_element = ui_class(wordle_puzzle, url=args.url, headless=args.headless, driver_path=args.driver)
 
-    wordle_puzzle = WordlePuzzle(configuration_map, possible_words)
-    ui_element = TerminalUI(wordle_puzzle)
-    
-    ui_element.solve()
+    with metrics.profile(args.profile):
+        ui_element.solve()
 
     print(ui_element)
+    if args.timing and ui_element.first_word_time != None:
+        print(f"<main>: Import time: {import_time:.3f}s, Time to first word: {ui_element.first_word_time - START_TIME:.3f}s",
+              file=sys.stderr)
+    if args.metrics != None:
+        with open(args.metrics, "w") as metrics_file:
+            json.dump({"trace": metrics.take_trace(), "summary": metrics.summary()}, metrics_file, indent=1)
@@ -0,0 +1,151 @@
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import functools
+import tracemalloc
+import contextlib
+from collections import Counter
+
+# Set to 1 to record timers, counters and traces; set the profile variable to "cprofile" or "tracemalloc"
+METRICS_ENV = "WORDLE_METRICS"
+PROFILE_ENV = "WORDLE_PROFILE"
+PROFILE_MODES = ("cprofile", "tracemalloc")
+PROFILE_TOP = 25
+
+enabled = os.environ.get(METRICS_ENV, "") not in ("", "0")
+counters: Counter = Counter()
+# name -> [calls, total seconds, longest call]
+timers: dict[str, list] = {}
+trace: list[dict] = []
+# Events of the traced calls in progress; note() adds fields to the innermost one
+open_events: list[dict] = []
+
+def enable(on: bool = True) -> None:
+    '''Switches recording on or off. The environment variable is set too, so that worker processes follow.'''
+    global enabled
+    enabled = on
+    os.environ[METRICS_ENV] = "1" if on else "0"
+
+def reset() -> None:
+    counters.clear()
+    timers.clear()
+    trace.clear()
+    open_events.clear()
+
+def count(name: str, amount: int = 1) -> None:
+    if enabled:
+        counters[name] += amount
+
+def record(name: str, elapsed: float) -> None:
+    '''Adds a call of 'elapsed' seconds to the timer 'name'.'''
+    timer = timers.get(name)
+    if timer is None:
+        timers[name] = [1, elapsed, elapsed]
+        return
+    timer[0] += 1
+    timer[1] += elapsed
+    timer[2] = max(timer[2], elapsed)
+
+def note(**fields) -> None:
+    '''Adds fields to the event of the innermost traced call.'''
+    if open_events:
+        open_events[-1].update(fields)
+
+def timed(name: str, traced: bool = False):
+    '''Decorator timing every call under 'name'. A 'traced' call also adds an event to the trace, with its noted fields.
+    While recording is off, the only cost is a check of the flag.'''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            event = {"op": name}
+            open_events.append(event)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                open_events.pop()
+                record(name, elapsed)
+                if traced:
+                    event["time"] = elapsed
+                    trace.append(event)
+        return wrapper
+    return decorator
+
+@contextlib.contextmanager
+def timing(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def timer(name: str):
+    '''Context manager timing its block under 'name', or doing nothing while recording is off.'''
+    return timing(name) if enabled else contextlib.nullcontext()
+
+def take_trace() -> list[dict]:
+    '''Returns the events traced so far, and starts a new trace.'''
+    events = list(trace)
+    trace.clear()
+    return events
+
+def summary() -> dict:
+    timer_summary = {name: {"calls": calls, "total": total, "mean": total / calls, "max": longest}
+                     for name, (calls, total, longest) in sorted(timers.items())}
+    # Hit rates of every counter pair named <name>_hits and <name>_misses
+    rates = {}
+    for name in counters:
+        if name.endswith("_hits"):
+            prefix = name[:-len("_hits")]
+            lookups = counters[name] + counters.get(prefix + "_misses", 0)
+            rates[prefix + "_hit_rate"] = counters[name] / lookups if lookups != 0 else 0.0
+    return {"counters": dict(sorted(counters.items())), "rates": rates, "timers": timer_summary}
+
+def merge(other: dict) -> None:
+    '''Adds a summary recorded elsewhere, such as in a worker process, to the aggregates.'''
+    counters.update(other["counters"])
+    for name, stats in other["timers"].items():
+        timer = timers.setdefault(name, [0, 0.0, 0.0])
+        timer[0] += stats["calls"]
+        timer[1] += stats["total"]
+        timer[2] = max(timer[2], stats["max"])
+
+@contextlib.contextmanager
+def profile(mode: str = None, path: str = None, stream = sys.stderr):
+    '''Profiles its block with cProfile or tracemalloc ('mode', by default from the environment variable).
+    The cProfile stats are written to 'path' if given, and the top entries of either are printed to 'stream'.'''
+    mode = mode if mode != None else os.environ.get(PROFILE_ENV) or None
+    if mode == None:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise Exception(f"<metrics>: Unknown profile mode {mode!r}")
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if path != None:
+                profiler.dump_stats(path)
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        return
+
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"<metrics>: Peak traced memory: {peak / 2**20:.1f} MiB", file=stream)
+        for statistic in snapshot.statistics("lineno")[:PROFILE_TOP]:
+            print(f"  {statistic}", file=stream)
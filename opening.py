@@ -0,0 +1,157 @@
+
+import os
+import json
+import argparse
+import threading
+
+from elements import ConfigMap, load_wordlist
+
+# Key of the first word of a book; the second words are keyed by "<first word>:<configuration>"
+FIRST_WORD_KEY = ""
+# Entries the puzzles may add to a book as they play, beyond which only compile_book adds more. A book of a
+# single game has at most one entry per configuration of its first word, but one of several games has one per
+# combination of them, and nearly every game of a multi mode book would add a new one.
+MAX_ENTRIES = 4096
+
+def book_path(path_to_config: str, mode: str) -> str:
+    '''Returns the path of the opening book of 'mode', stored alongside the config map cache at 'path_to_config'.'''
+    return f"{os.path.splitext(path_to_config)[0]}.{mode}.book.json"
+
+def book_key(first_guess: tuple[str, str] = None) -> str:
+    '''Returns the key of the word to enter after 'first_guess', a (word, configuration string) pair, or of the first word.'''
+    if first_guess is None:
+        return FIRST_WORD_KEY
+    return f"{first_guess[0]}:{first_guess[1]}"
+
+class OpeningBook():
+    '''
+    The words a puzzle opens with, for a mode and a pair of word lists: the first word, and the second word for every
+    first word and configuration it recieved. Each entry holds the word and whether it completes the puzzle.
+
+    Entries missing from the book are added in memory as the puzzles search for them, up to 'max_entries' (no limit
+    if None), and only for games that opened with the first word of the book. The book is only written to its
+    'path' by save(), which compile_book calls once it is done, so playing never waits on the file.
+    '''
+    def __init__(self, mode: str, word_list_hashes: tuple[str, str], path: str = None, max_entries: int = MAX_ENTRIES) -> None:
+        self.mode = mode
+        self.word_list_hashes = tuple(word_list_hashes)
+        self.path = path
+        self.max_entries = max_entries
+        self.entries: dict[str, list] = {}
+        self.lock = threading.Lock()
+
+    def __str__(self) -> str:
+        return f"<OpeningBook Object> Mode: {self.mode}, Entries: {len(self.entries)}"
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def isCurrent(self, config_map: ConfigMap) -> bool:
+        '''Checks if the book was made for the word lists of 'config_map'.'''
+        return self.word_list_hashes == config_map.wordListHashes()
+
+    def get(self, first_guess: tuple[str, str] = None) -> list:
+        '''Returns the entry for the word after 'first_guess' (the first word if None), or None.'''
+        return self.entries.get( book_key(first_guess) )
+
+    def put(self, first_guess: tuple[str, str], entry: list) -> None:
+        '''Adds the entry for the word after 'first_guess' (the first word if None), unless the book is full or
+        the game opened with another word than the book's, such as one resumed from a transcript.'''
+        key = book_key(first_guess)
+        with self.lock:
+            if first_guess is not None:
+                first_entry = self.entries.get(FIRST_WORD_KEY)
+                if first_entry is None or first_entry[0] != first_guess[0]:
+                    return
+            if self.max_entries != None and len(self.entries) >= self.max_entries and key not in self.entries:
+                return
+            self.entries[key] = list(entry)
+
+    @staticmethod
+    def load(path: str) -> "OpeningBook":
+        '''Returns the book stored at 'path', or None if it is missing or unreadable.'''
+        try:
+            with open(path, "r") as book_file:
+                data = json.load(book_file)
+            book = OpeningBook(data["mode"], data["word_list_hashes"], path)
+            book.entries.update(data["entries"])
+            return book
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path: str = None) -> None:
+        '''Writes the book to 'path' (its own path by default), keeping the entries of a current book already there.'''
+        path = path or self.path
+        if path is None:
+            raise Exception("<OpeningBook>: No path to save the book to")
+        stored = OpeningBook.load(path)
+        with self.lock:
+            if stored != None and stored.mode == self.mode and stored.word_list_hashes == self.word_list_hashes:
+                for key, entry in stored.entries.items():
+                    self.entries.setdefault(key, entry)
+            # Puzzles on other threads may add entries while the snapshot is written
+            entries = dict(self.entries)
+
+        temp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(temp_path, "w") as book_file:
+            json.dump({"mode": self.mode, "word_list_hashes": list(self.word_list_hashes), "entries": entries}, book_file)
+        os.replace(temp_path, path)
+
+def opening_book(config_map: ConfigMap, mode: str) -> OpeningBook:
+    '''Returns the opening book of 'mode' for the config map, loaded from beside its cache file once per config map.
+    A book made for other word lists is discarded and started again, as is a missing one.'''
+    books = config_map.opening_books
+    book = books.get(mode)
+    if book is None:
+        path_to_config = getattr(config_map, "path_to_config", None)
+        path = book_path(path_to_config, mode) if path_to_config != None else None
+        book = OpeningBook.load(path) if path != None else None
+        if book is None or book.mode != mode or not book.isCurrent(config_map):
+            book = OpeningBook(mode, config_map.wordListHashes(), path)
+        book = books.setdefault(mode, book)
+    return book
+
+def compile_book(config_map: ConfigMap, word_list: list[str], mode: str = "normal", no_of_games: int = 1,
+                 sample: int = None, seed: int = 0, progress = None) -> OpeningBook:
+    '''Fills the opening book of a mode by playing the first two words of a game against every word in 'word_list'
+    (or a 'sample' of them, each paired with other words for several games at once), saves it beside the config
+    map cache, and returns it. The book is not limited to MAX_ENTRIES here.'''
+    from simulate import create_puzzle, choose_games, feedback
+
+    games = choose_games(word_list, no_of_games, sample, seed)
+    book = None
+    for index, mystery_words in enumerate(games):
+        wordle_puzzle = create_puzzle(config_map, word_list, mode, no_of_games)
+        book = wordle_puzzle.openingBook()
+        if book is None:
+            raise Exception("<OpeningBook>: The puzzles do not use an opening book")
+        book.max_entries = None
+        solution_generator = wordle_puzzle.solutionGenerator()
+        first_word = next(solution_generator)
+        if first_word != "COMPLETED":
+            solution_generator.send( feedback(list(mystery_words), first_word) )
+        if progress != None:
+            progress(index + 1, len(games))
+    if book != None and book.path != None:
+        book.save()
+    return book
+
+if __name__ == "__main__":
+    from build import ProgressReporter
+    from simulate import NORMAL_MODE, HARD_MODE, MULTI_MODE
+
+    parser = argparse.ArgumentParser(description="Precomputes the first and second words of every game into an opening book.")
+    parser.add_argument("--mode", choices=[NORMAL_MODE, HARD_MODE, MULTI_MODE], default=NORMAL_MODE)
+    parser.add_argument("--games", type=int, default=2, help="number of simultaneous games in multi mode")
+    parser.add_argument("--sample", type=int, default=None, help="only play a seeded sample of the possible words")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config-map", default="wordle_data.bin")
+    parser.add_argument("--possible", default="wordle_words.txt")
+    parser.add_argument("--accepted", default="all_words.txt")
+    args = parser.parse_args()
+
+    possible_words = load_wordlist(args.possible)
+    configuration_map = ConfigMap(args.config_map, possible_words, load_wordlist(args.accepted))
+    opening = compile_book(configuration_map, possible_words, args.mode, args.games if args.mode == MULTI_MODE else 1,
+                           args.sample, args.seed, ProgressReporter("<OpeningBook>: Compiling"))
+    print(opening, "->", opening.path)
@@ -0,0 +1,189 @@
+
+import os
+import argparse
+
+import numpy as np
+
+from elements import ConfigMap, WORD_SIZE, code_dtype, load_wordlist
+from puzzle import WordlePuzzle, WordleHardPuzzle
+from simulate import play_game, NORMAL_MODE, HARD_MODE
+
+class PolicyNode():
+    '''A step of a compiled strategy: the word to enter, and the next step for each configuration it can recieve.'''
+    __slots__ = ("word", "final", "children")
+
+    def __init__(self, word: str, final: bool = False) -> None:
+        self.word = word
+        self.final = final
+        self.children: dict[int, PolicyNode] = {}
+
+class PolicyTree():
+    '''Represents the complete strategy of a puzzle, compiled for a pair of word lists.'''
+    def __init__(self, mode: str, word_list_hashes: tuple[str, str], root: PolicyNode = None) -> None:
+        self.mode = mode
+        self.word_list_hashes = tuple(word_list_hashes)
+        self.root = root
+
+    def __str__(self) -> str:
+        return f"<PolicyTree Object> Mode: {self.mode}, Nodes: {self.size()}"
+
+    def nodes(self):
+        '''Yields the nodes in preorder, with the config code that leads to them (None for the root).'''
+        if self.root is None:
+            return
+        stack = [(None, self.root)]
+        while stack:
+            code, node = stack.pop()
+            yield code, node
+            for child_code in sorted(node.children, reverse=True):
+                stack.append( (child_code, node.children[child_code]) )
+
+    def size(self) -> int:
+        '''Returns the number of nodes in the tree.'''
+        return sum(1 for _ in self.nodes())
+
+    def isCurrent(self, config_map: ConfigMap) -> bool:
+        '''Checks if the tree was compiled from the word lists of 'config_map'.'''
+        return self.word_list_hashes == config_map.wordListHashes()
+
+    def save(self, path: str) -> None:
+        '''Stores the tree as flat preorder arrays, with each word stored once.'''
+        words, word_ids, finals, no_of_children, codes = [], [], [], [], []
+        word_id = {}
+        for code, node in self.nodes():
+            if node.word not in word_id:
+                word_id[node.word] = len(words)
+                words.append(node.word)
+            word_ids.append(word_id[node.word])
+            finals.append(node.final)
+            no_of_children.append(len(node.children))
+            if code is not None:
+                codes.append(code)
+
+        # Every word of the tree has the number of letters of its config map, which sets the type of its codes
+        word_size = len(words[0]) if len(words) != 0 else WORD_SIZE
+        with open(path, "wb") as policy_file:
+            np.savez_compressed(policy_file, mode=np.array(self.mode), word_list_hashes=np.array(self.word_list_hashes),
+                                words=np.array(words, dtype=str), word_ids=np.array(word_ids, dtype=np.int32),
+                                finals=np.array(finals, dtype=bool), no_of_children=np.array(no_of_children, dtype=np.uint16),
+                                codes=np.array(codes, dtype=code_dtype(word_size)))
+
+    @staticmethod
+    def load(path: str) -> "PolicyTree":
+        '''Loads a tree stored by save.'''
+        with np.load(path, allow_pickle=False) as data:
+            words = data["words"].tolist()
+            word_ids = data["word_ids"].tolist()
+            finals = data["finals"].tolist()
+            no_of_children = data["no_of_children"].tolist()
+            codes = data["codes"].tolist()
+            tree = PolicyTree(str(data["mode"]), data["word_list_hashes"].tolist())
+
+        # Rebuild the preorder: every node waits on the stack until all of its children are attached
+        stack = []
+        for index, word_id in enumerate(word_ids):
+            node = PolicyNode(words[word_id], finals[index])
+            if index == 0:
+                tree.root = node
+            else:
+                parent = stack[-1]
+                parent[0].children[codes[index - 1]] = node
+                parent[1] -= 1
+                if parent[1] == 0:
+                    stack.pop()
+            if no_of_children[index] != 0:
+                stack.append( [node, no_of_children[index]] )
+        return tree
+
+def load_policy(path: str, config_map: ConfigMap, mode: str = NORMAL_MODE) -> PolicyTree:
+    '''Returns the tree stored at 'path', or None if it is missing, of another mode, or compiled from other word lists.'''
+    if not os.path.isfile(path):
+        return None
+    tree = PolicyTree.load(path)
+    if tree.mode != mode or not tree.isCurrent(config_map):
+        return None
+    return tree
+
+class PolicyPuzzle(WordlePuzzle):
+    '''Wordle Puzzle that follows a compiled PolicyTree, and only searches for the next word when the tree
+    does not cover the current path. With 'record' set, the words it searches for are added to the tree.'''
+    def __init__(self, configuration_map: ConfigMap, word_list: list[str], policy: PolicyTree = None, record: bool = False) -> None:
+        super().__init__(configuration_map, word_list)
+        self.policy = policy
+        self.record = record
+        self.policy_node = None
+        self.off_policy = False
+        self.last_code = None
+
+    def configurationGenerator(self, string: str):
+        config = super().configurationGenerator(string)
+        self.last_code = config.get_code()
+        return config
+
+    def findNextWord(self) -> str:
+        if self.complete:
+            return
+
+        if self.policy is None or self.off_policy:
+            return super().findNextWord()
+
+        parent = self.policy_node
+        node = self.policy.root if parent is None else parent.children.get(self.last_code)
+        if node is None:
+            next_word = super().findNextWord()
+            if not self.record:
+                self.off_policy = True
+                return next_word
+            node = PolicyNode(next_word, self.complete)
+            if parent is None:
+                self.policy.root = node
+            else:
+                parent.children[self.last_code] = node
+            self.policy_node = node
+            return next_word
+
+        self.policy_node = node
+        if node.final:
+            self.complete = True
+            self.mystery_word = node.word
+        return node.word
+
+    def reset(self) -> None:
+        super().reset()
+        self.policy_node = None
+        self.off_policy = False
+        self.last_code = None
+
+class PolicyHardPuzzle(WordleHardPuzzle, PolicyPuzzle):
+    '''Hard Mode Wordle Puzzle that follows a compiled PolicyTree.'''
+    def __init__(self, configuration_map: ConfigMap, word_list: list[str], policy: PolicyTree = None, record: bool = False) -> None:
+        super().__init__(configuration_map, word_list)
+        self.policy = policy
+        self.record = record
+
+def compile_policy(config_map: ConfigMap, word_list: list[str], mode: str = NORMAL_MODE, progress = None) -> PolicyTree:
+    '''Plays the solver against every word in 'word_list', and records every word it chooses as a PolicyTree.'''
+    tree = PolicyTree(mode, config_map.wordListHashes())
+    puzzle_type = PolicyHardPuzzle if mode == HARD_MODE else PolicyPuzzle
+    for index, mystery_word in enumerate(word_list):
+        play_game( puzzle_type(config_map, word_list, tree, record=True), [mystery_word] )
+        if progress != None:
+            progress(index + 1, len(word_list))
+    return tree
+
+if __name__ == "__main__":
+    from build import ProgressReporter
+
+    parser = argparse.ArgumentParser(description="Compiles the solver's strategy into a policy tree.")
+    parser.add_argument("--mode", choices=[NORMAL_MODE, HARD_MODE], default=NORMAL_MODE)
+    parser.add_argument("--config-map", default="wordle_data.bin")
+    parser.add_argument("--possible", default="wordle_words.txt")
+    parser.add_argument("--accepted", default="all_words.txt")
+    parser.add_argument("--output", default=None, help="defaults to wordle_policy_<mode>.npz")
+    args = parser.parse_args()
+
+    possible_words = load_wordlist(args.possible)
+    configuration_map = ConfigMap(args.config_map, possible_words, load_wordlist(args.accepted))
+    policy_tree = compile_policy(configuration_map, possible_words, args.mode, ProgressReporter("<PolicyTree>: Compiling"))
+    policy_tree.save(args.output or f"wordle_policy_{args.mode}.npz")
+    print(policy_tree)
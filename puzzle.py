@@ -1,19 +1,44 @@
 
 import math
 
-from elements import Configuration, WordSet, ConfigMap
-from elements import GREEN, YELLOW, GRAY
+import numpy as np
+
+from elements import Configuration, WordSet, ConfigMap, expected_bits_sum
+from constraints import HardModeConstraints
+from search import LookaheadSearch
+from guess_cache import GuessCache
+from opening import OpeningBook, opening_book
+import metrics
+
+# Largest number of simultaneous games a WordleMultiPuzzle can solve
+MAX_GAMES = 16
 
 class WordlePuzzle():
     '''Represts a classic Wordle Puzzle'''
-    def __init__(self, configuration_map: ConfigMap, word_list: list[str]) -> None:
-        '''Require path to list of words and config map to initialize the variables.'''
+    # Cache of the best next words, shared by every puzzle unless set on a single one
+    guess_cache: GuessCache = None
+    # Puzzles open with the words of the opening book of their mode, unless switched off here or on a single one
+    use_opening_book: bool = True
+
+    def __init__(self, configuration_map: ConfigMap, word_list: list[str], lookahead: LookaheadSearch = None) -> None:
+        '''Require path to list of words and config map to initialize the variables.
+        With a 'lookahead' search, the next word is chosen by looking two guesses ahead instead of by the most bits.'''
         self.complete = False
         self.steps = 0
         self.mystery_word = "UNSOLVED"
 
-        self.word_set = WordSet(word_list)
+        self.word_list = word_list
         self.config_map = configuration_map
+        self.word_set = WordSet(word_list, configuration_map)
+        self.lookahead = lookahead
+        # Opening books are made for games over every possible word
+        self.full_word_list = self.word_set.size() == len(configuration_map.possible_words)
+        # The first word entered and the configuration it recieved, which key the second word in the opening book
+        self.first_guess = None
+        # Approximate scorer for large sets of words, such as a SampledScorer; None scores every word exactly
+        self.scorer = None
+        # Reducer of the words worth scoring, such as a GuessSpaceReducer; it is specific to this puzzle
+        self.reducer = None
 
     def __str__(self) -> str:
         string = ""
@@ -27,8 +52,7 @@ class WordlePuzzle():
         '''Begins a feedback loop, wherein the program suggests the next best word, and requests
         the user to enter the obtained configuration output.'''
         self.mystery_word = self.findNextWord() # obtain the next Word
-        # self.mystery_word = "crane"
-        self.steps = 1
+        self.steps += 1
         
         while True:
             config: Configuration = self.configurationGenerator((yield self.mystery_word))
@@ -38,6 +62,8 @@ class WordlePuzzle():
                 self.complete = True
                 break
             
+            if self.steps == 1:
+                self.first_guess = (self.mystery_word, config.get_config_string())
             self.word_set.reduceWordSet(self.mystery_word, self.config_map, config)
             self.mystery_word = self.findNextWord() # obtain the next Word
             self.steps += 1
@@ -46,34 +72,121 @@ class WordlePuzzle():
     
     def configurationGenerator(self, string: str) -> Configuration:
         '''Obtains a user input on the recieved configuration, and returns a Configuration Object'''
-        return Configuration( string )
+        config = Configuration( string )
+        if config.size != self.config_map.word_size:
+            raise Exception("<Wordle>: Configuration does not match the size of the words")
+        return config
     
     def isCompleteConfig(self, config: Configuration) -> bool:
         '''Checks wether the puzzle has been solved'''
         return config.isComplete()
 
+    def checkConfiguration(self, my_word: str, string: str) -> None:
+        '''Raises an Exception unless 'string' is a configuration that entering 'my_word' can recieve, given the
+        possible answers left. A configuration refused here leaves the puzzle and its solutionGenerator untouched.'''
+        config = WordlePuzzle.configurationGenerator(self, string)
+        if not self.complete and not self.word_set.hasMatch(my_word, self.config_map, config):
+            raise Exception("<Wordle>: No Words match the configuration entered")
+
+    @metrics.timed("findNextWord", traced=True)
     def findNextWord(self) -> str:
         '''Returns the best next word, given the current state of the puzzle'''
 
         # If the puzzle is solved then this function has no purpose and hence returns empty
         if self.complete:
             return
+        metrics.note(step=self.steps, candidates=self.word_set.size())
+
+        book = self.openingBook()
+        if book is None:
+            return self.cachedNextWord()
+        entry = book.get(self.first_guess)
+        if entry is not None:
+            metrics.count("opening_book_hits")
+            metrics.note(book="hit")
+            next_word, self.complete = entry
+            if self.complete:
+                self.mystery_word = next_word
+            return next_word
+
+        metrics.count("opening_book_misses")
+        next_word = self.cachedNextWord()
+        book.put(self.first_guess, [next_word, self.complete])
+        return next_word
 
-        # Find which word give the highest bits, ie would provide the most information.
-        highest_bits = -math.inf
-        next_word = ""
-
-        for word in self.config_map.get_config_map():
-            if not self.isValidWord(word):
-                continue
+    def cachedNextWord(self) -> str:
+        '''Returns the best next word from the guess cache, or searches for it and adds it to the cache.'''
+        if self.guess_cache is None:
+            return self.searchNextWord()
+
+        key = self.cacheKey()
+        cached = self.guess_cache.get(key)
+        if cached is not None:
+            metrics.count("guess_cache_hits")
+            metrics.note(cache="hit")
+            next_word, self.complete = cached
+            if self.complete:
+                self.mystery_word = next_word
+            return next_word
+
+        metrics.count("guess_cache_misses")
+        metrics.note(cache="miss")
+        next_word = self.searchNextWord()
+        self.guess_cache.put(key, [next_word, self.complete])
+        return next_word
 
-            bits = self.word_set.expectedBitsInWord(self.config_map, word)
-            if bits > highest_bits:
-                highest_bits = bits
-                next_word = word  
-            elif bits>0 and bits == highest_bits and self.word_set.hasWord(word):  
-                highest_bits = bits
-                next_word = word
+    def openingBook(self) -> OpeningBook:
+        '''Returns the opening book of the puzzle while it looks for its first two words, or None if it does not use one.
+        The searches that pick other words than the plain one (lookahead and sampled scoring) do not use a book.'''
+        if not self.use_opening_book or not self.full_word_list or self.lookahead != None or self.scorer != None:
+            return None
+        if self.steps > 1 or (self.steps == 1 and self.first_guess is None):
+            return None
+        return opening_book(self.config_map, self.bookMode())
+
+    def bookMode(self) -> str:
+        '''Returns the mode of the opening book of the puzzle.'''
+        return "normal"
+
+    def cacheKey(self) -> str:
+        '''Returns the key of the current state of the puzzle in the guess cache.'''
+        return self.guess_cache.key(self.searchMode("normal"), self.config_map, [self.word_set.getIndices()])
+
+    def searchMode(self, mode: str) -> str:
+        '''Returns the name of 'mode' with the search options that change the words the puzzle picks.'''
+        if self.lookahead != None:
+            mode += "-lookahead"
+        if self.scorer != None:
+            mode += "-sampled"
+        return mode
+
+    def scoreWords(self, word_indices: np.ndarray = None) -> np.ndarray:
+        '''Returns the expected bits of every accepted word (or those at 'word_indices').'''
+        if self.reducer != None:
+            return self.reducer.score([self.word_set.getIndices()], word_indices, self.scorer)
+        if self.scorer != None:
+            return self.scorer.score([self.word_set.getIndices()], word_indices)
+        return self.word_set.expectedBitsForAll(self.config_map, word_indices)
+
+    def searchNextWord(self) -> str:
+        '''Scores the words to find the best next word'''
+        # Find which word give the highest bits, ie would provide the most information.
+        valid_words = self.validWordMask()
+        if valid_words is None:
+            bits = self.scoreWords()
+        else:
+            # Only the words that may be entered are scored
+            bits = np.full(len(valid_words), -math.inf)
+            word_indices = np.flatnonzero(valid_words)
+            bits[word_indices] = self.scoreWords(word_indices)
+        scored = len(bits) if valid_words is None else len(word_indices)
+        metrics.count("guesses_scored", scored)
+        metrics.note(scored=scored)
+        highest_bits, next_word = self.pickWord(bits)
+
+        # None of the accepted words may be entered, but the possible answers always can
+        if highest_bits == -math.inf:
+            return self.word_set.pop()
 
         if highest_bits == 0:
             if self.word_set.size() == 0:
@@ -82,8 +195,40 @@ class WordlePuzzle():
             self.mystery_word = self.word_set.pop()
             return self.mystery_word
 
+        if self.lookahead != None:
+            return self.lookahead.bestWord(self.word_set.getIndices(), bits)
         return next_word
-    
+
+    def pickWord(self, bits: np.ndarray) -> tuple[float, str]:
+        '''Returns the highest bits and the word that provides them. Between equally good words, the last one
+        that could still be the answer is preferred, otherwise the first one.'''
+        if len(bits) == 0:
+            return -math.inf, ""
+        highest_bits = float(bits.max())
+        if highest_bits == -math.inf:
+            return highest_bits, ""
+        best = np.flatnonzero(bits == highest_bits)
+        if highest_bits > 0:
+            possible = self.config_map.accepted_to_possible[best]
+            in_set = [index for index, possible_index in zip(best.tolist(), possible.tolist()) if self.word_set.hasIndex(possible_index)]
+            if len(in_set) != 0:
+                return highest_bits, self.config_map.accepted_words[in_set[-1]]
+        return highest_bits, self.config_map.accepted_words[best[0]]
+
+    def applyGuess(self, my_word: str, string: str) -> bool:
+        '''Applies a word entered outside of the solutionGenerator and the configuration it recieved, as when resuming
+        a game from a transcript. Returns True if the word solved the puzzle.'''
+        config = self.configurationGenerator(string)
+        self.steps += 1
+        if self.isCompleteConfig(config):
+            self.complete = True
+            self.mystery_word = my_word
+            return True
+        if self.steps == 1:
+            self.first_guess = (my_word, config.get_config_string())
+        self.word_set.reduceWordSet(my_word, self.config_map, config)
+        return False
+
     def revealMysteryWord( self ) -> str:
         '''Returns the answer of the puzzle, if solved.'''
         if self.complete:
@@ -93,13 +238,20 @@ class WordlePuzzle():
     def isValidWord(self, _) -> bool:
         return True
 
+    def validWordMask(self) -> np.ndarray:
+        '''Returns a mask of the accepted words that may be entered next, or None if all of them may be.'''
+        return None
+
     def reset( self ) -> None:
         '''Resets the variables of the puzzle.'''
         self.complete = False
         self.steps = 0
         self.mystery_word = "UNSOLVED"
 
-        self.word_set = WordSet(self.word_list)
+        self.word_set = WordSet(self.word_list, self.config_map)
+        self.first_guess = None
+        if self.reducer != None:
+            self.reducer.reset()
 
     def getPuzzleSize(_) -> int:
         return 1
@@ -110,6 +262,7 @@ class WordleHardPuzzle(WordlePuzzle):
         
         self.prev_word = ""
         self.prev_config = Configuration()
+        self.constraints = HardModeConstraints(configuration_map)
 
     def __str__(self) -> str:
         string = ""
@@ -126,42 +279,39 @@ class WordleHardPuzzle(WordlePuzzle):
     def configurationGenerator(self, string: str) -> Configuration:
         '''Obtains a user input on the recieved configuration, and returns a Configuration Object'''
         self.prev_config = super().configurationGenerator(string)
+        self.constraints.add(self.prev_word, self.prev_config)
         return self.prev_config
 
+    def applyGuess(self, my_word: str, string: str) -> bool:
+        self.prev_word = my_word
+        return super().applyGuess(my_word, string)
+
+    def validWordMask(self) -> np.ndarray:
+        return self.constraints.validWordMask()
+
+    def bookMode(self) -> str:
+        return "hard"
+
+    def cacheKey(self) -> str:
+        return self.guess_cache.key(self.searchMode("hard"), self.config_map, [self.word_set.getIndices()], self.constraints.key())
+
     def isValidWord(self, word: str) -> bool:
-        prev_config = self.prev_config.get_config()
-        temp_word = self.prev_word
-        for index in range(len(temp_word)):
-            if prev_config[index] != GREEN:
-                continue
-            if temp_word[index] != word[index]:
-                return False
-            word = word[0:index] + "_" + word[index+1:]
-            
-        for index in range(len(temp_word)):
-            if prev_config[index] != YELLOW:
-                continue
-            if temp_word[index] not in word:
-                return False
-            word = word[0:index] + "_" + word[index+1:]
-        return True
+        return self.constraints.isValidWord(word)
+
+    def reset(self) -> None:
+        super().reset()
+        self.prev_word = ""
+        self.prev_config = Configuration()
+        self.constraints = HardModeConstraints(self.config_map)
 
 class WordleMultiPuzzle(WordlePuzzle):
     def __init__(self, configuration_map: ConfigMap, word_list: list[str], no_of_games: int) -> None:
+        if no_of_games < 1 or no_of_games > MAX_GAMES:
+            raise Exception(f"<WordleMulti>: Number of games must be between 1 and {MAX_GAMES}")
         super().__init__(configuration_map, word_list)
         
         self.no_of_games = no_of_games
-        self.complete = False
-        self.solved = []
-        self.steps = 0
-        self.mystery_word = []
-
-        # word_list = load_wordlist(path_to_word_list)
-        self.word_set = []
-        for _ in range(no_of_games):
-            self.solved.append(False)
-            self.mystery_word.append("UNSOLVED")
-            self.word_set.append(WordSet(word_list))
+        self.reset()
 
     def __str__(self) -> str:
         string = f"<WordleMulti Object> {f'Complete, Steps: {self.steps}' if self.complete else 'Incomplete'}"
@@ -176,7 +326,7 @@ class WordleMultiPuzzle(WordlePuzzle):
         '''Begins a feedback loop, wherein the program suggests the next best word, and requests
         the user to enter the obtained configuration output.'''
         next_word, more_next_words = self.findNextWord() # obtain the next Word
-        self.steps = 1
+        self.steps += 1
 
         while True:
             configs: list[Configuration] = self.configurationGenerator((yield next_word))
@@ -185,7 +335,11 @@ class WordleMultiPuzzle(WordlePuzzle):
                 self.complete = True
                 break
 
+            if self.steps == 1:
+                self.first_guess = (next_word, "".join(config.get_config_string() for config in configs))
             for game_index in range(self.no_of_games):
+                if self.solved[game_index]:
+                    continue
                 self.word_set[game_index].reduceWordSet(next_word, self.config_map, configs[game_index])
             next_word, more_next_words = self.findNextWord() # obtain the next Word
             self.steps += 1
@@ -198,10 +352,36 @@ class WordleMultiPuzzle(WordlePuzzle):
 
     def configurationGenerator(self, string: str) -> list[Configuration]:
         configs = []
+        word_size = self.config_map.word_size
+        if len(string) != word_size * self.no_of_games:
+            raise Exception("<WordleMulti>: Configuration does not match the size of the words and the number of games")
         for index in range(self.no_of_games):
-            configs.append( Configuration( string[index*5:(index+1)*5] ) )
+            configs.append( Configuration( string[index*word_size:(index+1)*word_size] ) )
         return configs
     
+    def checkConfiguration(self, my_word: str, string: str) -> None:
+        configs = self.configurationGenerator(string)
+        if self.complete:
+            return
+        for game_index in range(self.no_of_games):
+            if not self.solved[game_index] and not self.word_set[game_index].hasMatch(my_word, self.config_map, configs[game_index]):
+                raise Exception(f"<WordleMulti>: No Words of game {game_index + 1} match the configuration entered")
+
+    def applyGuess(self, my_word: str, string: str) -> bool:
+        '''Applies a word entered outside of the solutionGenerator and the configurations it recieved in every game.
+        Returns True once every game is solved.'''
+        configs = self.configurationGenerator(string)
+        self.steps += 1
+        if self.isCompleteConfig(configs, my_word):
+            self.complete = True
+            return True
+        if self.steps == 1:
+            self.first_guess = (my_word, "".join(config.get_config_string() for config in configs))
+        for game_index in range(self.no_of_games):
+            if not self.solved[game_index]:
+                self.word_set[game_index].reduceWordSet(my_word, self.config_map, configs[game_index])
+        return False
+
     def isCompleteConfig(self, configs: list[Configuration], next_word: str) -> bool:
         returnValue = True
         for game_index in range(self.no_of_games):
@@ -214,22 +394,70 @@ class WordleMultiPuzzle(WordlePuzzle):
             returnValue = False
         return returnValue
 
-    def findNextWord(self) -> str:
+    @metrics.timed("findNextWord", traced=True)
+    def findNextWord(self) -> tuple[str, list[str]]:
         if self.complete:
             return
 
-        highest_bits = -math.inf
+        book = self.openingBook()
+        if book is None:
+            return self.searchNextWords()
+        entry = book.get(self.first_guess)
+        if entry is not None:
+            metrics.count("opening_book_hits")
+            metrics.note(book="hit")
+            return entry[0], []
+
+        metrics.count("opening_book_misses")
+        next_word, more_next_words = self.searchNextWords()
+        # Words that settle every game change the puzzle as they are found, so only the others are kept
+        if not self.complete:
+            book.put(self.first_guess, [next_word])
+        return next_word, more_next_words
+
+    def searchNextWords(self) -> tuple[str, list[str]]:
+        '''Returns the best next word, and once every game is settled, the words that solve the games left.'''
         next_word = ""
         more_next_words = []
-
-        for word in self.config_map.get_config_map():
-
-            bits = 0.0
-            for game_index in range(self.no_of_games):
-                bits += self.word_set[game_index].expectedBitsInWord( self.config_map, word )
-            if bits > highest_bits:
-                highest_bits = bits
-                next_word = word    
+        unsolved = [game_index for game_index in range(self.no_of_games) if not self.solved[game_index]]
+        sizes = [self.word_set[game_index].size() for game_index in unsolved]
+        metrics.note(step=self.steps, candidates=sizes)
+
+        highest_bits = 0.0
+        if max(sizes) > 1:
+            # A game that is down to a single word is solved by entering that word
+            if min(sizes) == 1:
+                return self.word_set[ unsolved[sizes.index(1)] ].pop(), more_next_words
+
+            # Only the unsolved games are scored, all of them in a single pass
+            mystery_index_sets = [self.word_set[game_index].getIndices() for game_index in unsolved]
+            key = None
+            if self.guess_cache is not None:
+                key = self.guess_cache.key(self.searchMode("multi"), self.config_map, mystery_index_sets)
+                cached = self.guess_cache.get(key)
+                if cached is not None:
+                    metrics.count("guess_cache_hits")
+                    metrics.note(cache="hit")
+                    return cached[0], more_next_words
+                metrics.count("guess_cache_misses")
+                metrics.note(cache="miss")
+
+            if self.reducer != None:
+                bits = self.reducer.score(mystery_index_sets, scorer=self.scorer)
+            elif self.scorer != None:
+                bits = self.scorer.score(mystery_index_sets)
+            else:
+                bits = expected_bits_sum(self.config_map, mystery_index_sets)
+            metrics.count("guesses_scored", len(bits))
+            metrics.note(scored=len(bits))
+            if len(bits) != 0:
+                highest_bits = float(bits.max())
+                next_word = self.config_map.accepted_words[ int(bits.argmax()) ]
+                if key is not None and highest_bits > 0:
+                    self.guess_cache.put(key, [next_word])
+            # No accepted word can tell the remaining words apart, so enter one of them
+            if highest_bits == 0:
+                return self.word_set[ unsolved[sizes.index(max(sizes))] ].pop(), more_next_words
 
         if highest_bits == 0:
             next_word = ""
@@ -249,5 +477,19 @@ class WordleMultiPuzzle(WordlePuzzle):
 
         return next_word, more_next_words
 
+    def reset(self) -> None:
+        '''Resets the variables of the puzzle, with a set of possible answers for every game.'''
+        self.complete = False
+        self.steps = 0
+        self.solved = [False] * self.no_of_games
+        self.mystery_word = ["UNSOLVED"] * self.no_of_games
+        self.word_set = [WordSet(self.word_list, self.config_map) for _ in range(self.no_of_games)]
+        self.first_guess = None
+        if self.reducer != None:
+            self.reducer.reset()
+
+    def bookMode(self) -> str:
+        return f"multi{self.no_of_games}"
+
     def getPuzzleSize(self) -> int:
         return self.no_of_games
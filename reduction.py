@@ -0,0 +1,158 @@
+
+import json
+import argparse
+
+import numpy as np
+
+from elements import ConfigMap, expected_bits_sum, load_wordlist
+import metrics
+
+# Sets of mystery words larger than this are scored without reducing the words first
+DEFAULT_REDUCE_LIMIT = 16
+# Odd 64 bit weights hashing a row of signature bytes to a single key
+HASH_WEIGHTS = np.random.default_rng(0x5EED).integers(1, 2**63, size=4096, dtype=np.uint64) | np.uint64(1)
+
+def group_rows(rows: np.ndarray) -> np.ndarray:
+    '''Returns a group number for every row, equal for equal rows. Rows are hashed to a single key each,
+    and compared in full only if two different rows share a key.'''
+    weights = np.resize(HASH_WEIGHTS, rows.shape[1])
+    keys = (rows.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+    _, first, groups = np.unique(keys, return_index=True, return_inverse=True)
+    groups = groups.reshape(-1)
+    if not np.array_equal(rows, rows[ first[groups] ]):
+        _, groups = np.unique(rows, axis=0, return_inverse=True)
+    return groups.reshape(-1)
+
+def partition_signature(codes: np.ndarray) -> np.ndarray:
+    '''Returns, for every row of config codes, whether each pair of mystery words shows the same configuration,
+    packed into bytes. Rows that split the mystery words into the same parts have equal signatures.'''
+    first, second = np.triu_indices(codes.shape[1], k=1)
+    return np.packbits(codes[:, first] == codes[:, second], axis=1)
+
+class GuessSpaceReducer():
+    '''
+    Reduces the words worth scoring at every step of a puzzle. Words that cannot split the mystery words
+    (every one of them would show the same configuration) are dropped, as they reveal no bits. Words that split
+    them into the same parts are grouped, and only one word of each group is scored.
+
+    As the mystery words only ever shrink, words grouped or dropped at one step stay so at the next ones,
+    so each step only has to look at the words that represented a group at the step before. The word
+    representing a group is the first one that may still be the answer, otherwise the first one.
+    '''
+    def __init__(self, config_map: ConfigMap, limit: int = DEFAULT_REDUCE_LIMIT) -> None:
+        self.config_map = config_map
+        self.limit = limit
+        self.reset()
+
+    def __str__(self) -> str:
+        return f"<GuessSpaceReducer Object> Representatives: {len(self.representatives)}/{len(self.group)}"
+
+    def reset(self) -> None:
+        no_of_words = len(self.config_map.accepted_words)
+        # accepted index -> position of its group in 'representatives', or -1 for words that reveal nothing
+        self.group = np.arange(no_of_words)
+        self.representatives = np.arange(no_of_words)
+        # (mystery words, words scored) at every step that was reduced
+        self.history: list[tuple[int, int]] = []
+
+    def reduce(self, mystery_index_sets: list[np.ndarray]) -> None:
+        '''Merges the groups of words that split every set of mystery words in the same way.'''
+        matrix = self.config_map.matrix
+        if len(self.representatives) == len(self.group):
+            # Every word still represents itself, so the columns are taken without copying every row first
+            codes = [ np.take(matrix, indices, axis=1) for indices in mystery_index_sets ]
+        else:
+            rows = matrix[self.representatives]
+            codes = [ rows[:, indices] for indices in mystery_index_sets ]
+        informative = np.zeros(len(self.representatives), dtype=bool)
+        for set_codes in codes:
+            informative |= set_codes.min(axis=1) != set_codes.max(axis=1)
+        signatures = np.hstack([ partition_signature(set_codes[informative]) for set_codes in codes ])
+        new_group = np.full(len(self.representatives), -1)
+        new_group[informative] = group_rows(signatures)
+
+        in_group = self.group >= 0
+        self.group[in_group] = new_group[ self.group[in_group] ]
+        in_group = self.group >= 0
+
+        # The first member of each group that may be the answer, otherwise its first member
+        is_candidate = np.zeros(len(self.group), dtype=bool)
+        accepted_to_possible = self.config_map.accepted_to_possible
+        for indices in mystery_index_sets:
+            is_candidate |= np.isin(accepted_to_possible, indices)
+        members = np.flatnonzero(in_group)
+        order = np.lexsort(( members, ~is_candidate[members], self.group[members] ))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = self.group[members[order]][1:] != self.group[members[order]][:-1]
+        self.representatives = members[order][first]
+        self.history.append( (sum(len(indices) for indices in mystery_index_sets), len(self.representatives)) )
+        metrics.note(representatives=len(self.representatives))
+
+    def score(self, mystery_index_sets: list[np.ndarray], word_indices: np.ndarray = None, scorer = None) -> np.ndarray:
+        '''Returns the expected bits of every accepted word (or those at 'word_indices'), summed over the sets of
+        mystery words, scoring a single word per group (with the 'scorer' if given).'''
+        mystery_index_sets = [indices for indices in mystery_index_sets if len(indices) != 0]
+        # Sets too large to be worth reducing, or fewer words asked for (as in hard mode) than there are groups.
+        # Skipping a step is safe, as words that split a set in the same way also split any part of it the same way.
+        if sum(len(indices) for indices in mystery_index_sets) > self.limit or \
+                (word_indices is not None and len(word_indices) < len(self.representatives)):
+            if scorer != None:
+                return scorer.score(mystery_index_sets, word_indices)
+            return expected_bits_sum(self.config_map, mystery_index_sets, word_indices)
+
+        self.reduce(mystery_index_sets)
+        if scorer != None:
+            representative_bits = scorer.score(mystery_index_sets, self.representatives)
+        else:
+            representative_bits = expected_bits_sum(self.config_map, mystery_index_sets, self.representatives)
+        bits = np.zeros(len(self.group), dtype=np.float64)
+        in_group = self.group >= 0
+        bits[in_group] = representative_bits[ self.group[in_group] ]
+        return bits if word_indices is None else bits[word_indices]
+
+def compare(config_map: ConfigMap, word_list: list[str], mode: str = "normal", no_of_games: int = 1,
+            sample: int = None, seed: int = 0, limit: int = DEFAULT_REDUCE_LIMIT) -> dict:
+    '''Plays the chosen answers with and without reducing the words, and returns the reduction ratio
+    at every step, the time spent per step, and whether both picked the same words.'''
+    from simulate import create_puzzle, choose_games, play_game
+
+    history, times, same_words = [], {"full": [], "reduced": []}, 0
+    # The first word is scored the same way by both, over every possible word
+    games = choose_games(word_list, no_of_games, sample, seed)
+    for mystery_words in games:
+        entered = {}
+        for name in ("full", "reduced"):
+            wordle_puzzle = create_puzzle(config_map, word_list, mode, no_of_games,
+                                          reducer=GuessSpaceReducer(config_map, limit) if name == "reduced" else None)
+            wordle_puzzle.use_opening_book = False
+            latencies = []
+            entered[name] = play_game(wordle_puzzle, list(mystery_words), latencies=latencies)
+            times[name] += latencies[1:]
+            if name == "reduced":
+                history += wordle_puzzle.reducer.history
+        same_words += entered["full"] == entered["reduced"]
+
+    return {"games": len(games), "mode": mode, "no_of_games": no_of_games, "limit": limit,
+            "same_words": same_words / len(games),
+            "reduced_steps": len(history),
+            # Words scored at a reduced step, over the accepted words scored without the reducer
+            "reduction_ratio": float(np.mean([scored for _, scored in history])) / len(config_map.accepted_words) if history else 1.0,
+            "mean_mystery_words": float(np.mean([size for size, _ in history])) if history else 0.0,
+            "full_later_step_time": float(np.mean(times["full"])), "reduced_later_step_time": float(np.mean(times["reduced"]))}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reports how much the guess-space reducer saves, and checks that it picks the same words.")
+    parser.add_argument("--mode", choices=["normal", "hard", "multi"], default="normal")
+    parser.add_argument("--games", type=int, default=2, help="number of simultaneous games in multi mode")
+    parser.add_argument("--sample", type=int, default=None, help="play a seeded sample of the possible words")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=DEFAULT_REDUCE_LIMIT)
+    parser.add_argument("--config-map", default="wordle_data.bin")
+    parser.add_argument("--possible", default="wordle_words.txt")
+    parser.add_argument("--accepted", default="all_words.txt")
+    args = parser.parse_args()
+
+    possible_words = load_wordlist(args.possible)
+    configuration_map = ConfigMap(args.config_map, possible_words, load_wordlist(args.accepted))
+    print(json.dumps(compare(configuration_map, possible_words, args.mode, args.games if args.mode == "multi" else 1,
+                             args.sample, args.seed, args.limit), indent=1))
@@ -0,0 +1,178 @@
+
+import math
+import json
+import time
+import argparse
+
+import numpy as np
+
+from elements import ConfigMap, expected_bits_sum, chunk_rows, load_wordlist
+from search import fingerprint
+
+DEFAULT_SAMPLE_SIZE = 256
+DEFAULT_REFINE = 32
+
+class SampledScorer():
+    '''
+    Scores words approximately, for sets of mystery words too large to score exactly in time:
+        1. The bits of every word are estimated over a seeded sample of 'sample_size' words of each set.
+        2. The words are refined (scored exactly) in order of their estimates, 'refine' at a time. Words whose upper
+           bound, log2 of the number of configurations they can show, cannot beat the best refined word are skipped.
+        3. Refining stops after the first 'refine' words, or with a 'deadline' (seconds), once it has passed.
+    Sets no larger than the sample are scored exactly. Unrefined words score just below the best refined word,
+    so the word picked has always been scored exactly.
+    '''
+    def __init__(self, config_map: ConfigMap, sample_size: int = DEFAULT_SAMPLE_SIZE, refine: int = DEFAULT_REFINE,
+                 deadline: float = None, seed: int = 0) -> None:
+        self.config_map = config_map
+        self.sample_size = sample_size
+        self.refine = refine
+        self.deadline = deadline
+        self.seed = seed
+        self.config_counts = None
+        self.refined = 0
+        self.pruned = 0
+
+    def __str__(self) -> str:
+        return f"<SampledScorer Object> Sample: {self.sample_size}, Refine: {self.refine}, Deadline: {self.deadline}"
+
+    def configCounts(self) -> np.ndarray:
+        '''Returns the number of distinct configurations every accepted word shows over all the possible words.'''
+        if self.config_counts is None:
+            matrix = self.config_map.matrix
+            no_of_codes = self.config_map.no_of_codes
+            self.config_counts = np.zeros(len(matrix), dtype=np.int64)
+            chunk_size = chunk_rows(no_of_codes, 1024)
+            for start in range(0, len(matrix), chunk_size):
+                codes = matrix[start:start + chunk_size].astype(np.int32)
+                codes += np.arange(len(codes), dtype=np.int32)[:, None] * no_of_codes
+                counts = np.bincount(codes.ravel(), minlength=len(codes) * no_of_codes).reshape(len(codes), no_of_codes)
+                self.config_counts[start:start + len(codes)] = np.count_nonzero(counts, axis=1)
+        return self.config_counts
+
+    def sample(self, mystery_indices: np.ndarray) -> np.ndarray:
+        '''Returns a sample of the mystery words, which is always the same for the same set.'''
+        if len(mystery_indices) <= self.sample_size:
+            return mystery_indices
+        generator = np.random.default_rng([self.seed, int.from_bytes(fingerprint(mystery_indices)[:8], "little")])
+        return np.sort( generator.choice(mystery_indices, self.sample_size, replace=False) )
+
+    def score(self, mystery_index_sets: list[np.ndarray], word_indices: np.ndarray = None) -> np.ndarray:
+        '''Returns the (approximate) expected bits of every accepted word (or those at 'word_indices'),
+        summed over the sets of mystery words.'''
+        start_time = time.perf_counter()
+        if word_indices is None:
+            word_indices = np.arange(len(self.config_map.accepted_words))
+        mystery_index_sets = [indices for indices in mystery_index_sets if len(indices) != 0]
+        self.refined = 0
+        self.pruned = 0
+        if all(len(indices) <= self.sample_size for indices in mystery_index_sets):
+            self.refined = len(word_indices)
+            return expected_bits_sum(self.config_map, mystery_index_sets, word_indices)
+
+        samples = [self.sample(indices) for indices in mystery_index_sets]
+        estimates = expected_bits_sum(self.config_map, samples, word_indices, bias_correction=True)
+        config_counts = self.configCounts()[word_indices]
+        bounds = sum( np.log2(np.minimum(len(indices), config_counts)) for indices in mystery_index_sets )
+
+        exact = np.full(len(word_indices), np.nan)
+        best = -math.inf
+        order = np.argsort(-estimates, kind="stable")
+        position = 0
+        while position < len(order):
+            # The next words by estimate, that may still beat the best refined word
+            contenders = []
+            while position < len(order) and len(contenders) < self.refine:
+                index = order[position]
+                position += 1
+                if bounds[index] > best:
+                    contenders.append(index)
+                else:
+                    self.pruned += 1
+            if len(contenders) == 0:
+                break
+            contenders = np.array(contenders)
+            exact[contenders] = expected_bits_sum(self.config_map, mystery_index_sets, word_indices[contenders])
+            best = max(best, float(exact[contenders].max()))
+            self.refined += len(contenders)
+            # A best of 0 bits would end the game, so refining goes on until some word tells the set apart
+            if best > 0 and (self.deadline is None or time.perf_counter() - start_time > self.deadline):
+                break
+
+        refined = ~np.isnan(exact)
+        bits = np.minimum(estimates, np.nextafter(best, -math.inf))
+        bits[refined] = exact[refined]
+        return bits
+
+def compare(config_map: ConfigMap, word_list: list[str], scorer: SampledScorer, mode: str = "normal",
+            sample: int = None, seed: int = 0) -> dict:
+    '''Plays the chosen answers with exact and with sampled scoring, and returns how far the sampled words were from
+    the best exactly scored word at every step (in bits), with the guesses and time per step of either.'''
+    from simulate import create_puzzle, choose_games, feedback, MULTI_MODE
+
+    if mode == MULTI_MODE:
+        raise Exception("<sampling>: Comparisons are made on single games")
+    accepted_index = config_map.accepted_index
+    runs = {"exact": {"guesses": [], "first_step_times": [], "step_times": []},
+            "sampled": {"guesses": [], "first_step_times": [], "step_times": []}}
+    regrets, refined = [], []
+    for (mystery_word,) in choose_games(word_list, 1, sample, seed):
+        for name, run in runs.items():
+            sampled = name == "sampled"
+            wordle_puzzle = create_puzzle(config_map, word_list, mode, scorer=scorer if sampled else None)
+            # Both search every step, so that the exact run does not take its opening from the book
+            wordle_puzzle.use_opening_book = False
+            solution_generator = wordle_puzzle.solutionGenerator()
+            start = time.perf_counter()
+            next_word = next(solution_generator)
+            run["first_step_times"].append(time.perf_counter() - start)
+            guesses = 0
+            while next_word != "COMPLETED":
+                run["step_times"].append(time.perf_counter() - start)
+                guesses += 1
+                if sampled and not wordle_puzzle.complete and next_word in accepted_index:
+                    # The state the word was picked for: the words still possible, and those that may be entered
+                    valid_words = wordle_puzzle.validWordMask()
+                    bits = expected_bits_sum(config_map, [wordle_puzzle.word_set.getIndices()])
+                    if valid_words is not None:
+                        bits[~valid_words] = -math.inf
+                    regrets.append( float(bits.max() - bits[accepted_index[next_word]]) )
+                    if wordle_puzzle.word_set.size() > scorer.sample_size:
+                        refined.append(scorer.refined)
+                start = time.perf_counter()
+                next_word = solution_generator.send( feedback([mystery_word], next_word) )
+            run["guesses"].append(guesses)
+
+    regrets = np.array(regrets)
+    report = {"games": len(runs["exact"]["guesses"]), "mode": mode, "sample_size": scorer.sample_size,
+              "refine": scorer.refine, "deadline": scorer.deadline}
+    for name, run in runs.items():
+        report[name] = {"mean_guesses": float(np.mean(run["guesses"])),
+                        "first_step_time": float(np.mean(run["first_step_times"])),
+                        "mean_step_time": float(np.mean(run["step_times"]))}
+    report["sampled"]["sampled_steps"] = len(refined)
+    report["sampled"]["mean_refined_when_sampled"] = float(np.mean(refined)) if refined else 0.0
+    report.update({
+        "optimal_steps": float(np.mean(regrets <= 1e-9)) if len(regrets) else 1.0,
+        "mean_regret_bits": float(regrets.mean()) if len(regrets) else 0.0,
+        "max_regret_bits": float(regrets.max()) if len(regrets) else 0.0,
+    })
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reports how far sampled scoring is from exact scoring on a set of answers.")
+    parser.add_argument("--mode", choices=["normal", "hard"], default="normal")
+    parser.add_argument("--sample", type=int, default=None, help="play a seeded sample of the possible words")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sample-size", type=int, default=DEFAULT_SAMPLE_SIZE)
+    parser.add_argument("--refine", type=int, default=DEFAULT_REFINE)
+    parser.add_argument("--deadline", type=float, default=None, metavar="SECONDS")
+    parser.add_argument("--config-map", default="wordle_data.bin")
+    parser.add_argument("--possible", default="wordle_words.txt")
+    parser.add_argument("--accepted", default="all_words.txt")
+    args = parser.parse_args()
+
+    possible_words = load_wordlist(args.possible)
+    configuration_map = ConfigMap(args.config_map, possible_words, load_wordlist(args.accepted))
+    sampled_scorer = SampledScorer(configuration_map, args.sample_size, args.refine, args.deadline, args.seed)
+    print(json.dumps(compare(configuration_map, possible_words, sampled_scorer, args.mode, args.sample, args.seed), indent=1))
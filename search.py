@@ -0,0 +1,117 @@
+
+import math
+import time
+import hashlib
+
+import numpy as np
+
+from elements import ConfigMap, expected_bits, complete_code
+
+# Rough number of bits a guess reveals deep in a game, used to estimate the guesses needed for larger sets
+LEAF_BITS_PER_GUESS = 4.0
+# Sets up to this size also consider entering one of their own words, which may end the game right away
+CANDIDATE_GUESS_LIMIT = 64
+MAX_MEMO_SIZE = 200000
+
+class SearchTimeout(Exception):
+    '''Raised inside the search once the time budget of a move has been used up.'''
+
+def fingerprint(mystery_indices: np.ndarray) -> bytes:
+    '''Returns a short digest identifying a set of mystery words.'''
+    return hashlib.blake2b( np.ascontiguousarray(mystery_indices, dtype=np.int64).tobytes(), digest_size=16 ).digest()
+
+def estimated_guesses(size: int) -> float:
+    '''Estimates the number of guesses needed to solve a set of 'size' mystery words, including the final one.'''
+    if size <= 1:
+        return 1.0
+    if size == 2:
+        return 1.5
+    return 2.0 + (math.log2(size) - math.log2(3)) / LEAF_BITS_PER_GUESS
+
+class LookaheadSearch():
+    '''
+    Chooses the word that minimises the expected number of remaining guesses, looking two guesses ahead:
+    the word entered now, and the best word for each configuration it may recieve. Only the 'breadth' most
+    informative words are tried at the first guess and 'inner_breadth' at the second, and the expected guesses
+    of each set of mystery words are memoized by its fingerprint.
+
+    If 'time_budget' (seconds) runs out during a move, the best word found so far is returned.
+    '''
+    def __init__(self, config_map: ConfigMap, breadth: int = 12, inner_breadth: int = 6, time_budget: float = None) -> None:
+        self.config_map = config_map
+        self.breadth = breadth
+        self.inner_breadth = inner_breadth
+        self.time_budget = time_budget
+        self.win_code = complete_code(config_map.word_size)
+        self.memo: dict[bytes, float] = {}
+        self.deadline = math.inf
+        self.evaluated = 0
+        self.timed_out = False
+
+    def __str__(self) -> str:
+        return f"<LookaheadSearch Object> Breadth: {self.breadth}/{self.inner_breadth}, Memoized Sets: {len(self.memo)}"
+
+    def bestWord(self, mystery_indices: np.ndarray, bits: np.ndarray) -> str:
+        '''Returns the best word to enter for the given mystery words, where 'bits' holds the expected bits of
+        every accepted word (-inf for words that may not be entered).'''
+        self.deadline = math.inf if self.time_budget is None else time.perf_counter() + self.time_budget
+        self.evaluated = 0
+        self.timed_out = False
+
+        options = self.options(mystery_indices, bits, self.breadth)
+        best_word, lowest_guesses = options[0], math.inf
+        try:
+            for word in options:
+                guesses = self.expectedGuessesAfter(word, mystery_indices, depth=1)
+                if guesses < lowest_guesses:
+                    best_word, lowest_guesses = word, guesses
+        except SearchTimeout:
+            self.timed_out = True
+        return best_word
+
+    def options(self, mystery_indices: np.ndarray, bits: np.ndarray, breadth: int) -> list[str]:
+        '''Returns the words worth trying: the 'breadth' words with the most bits, and for small sets the mystery words themselves.'''
+        allowed = np.flatnonzero(bits > -math.inf)
+        top = allowed[ np.argsort(-bits[allowed], kind="stable")[:breadth] ]
+        words = [self.config_map.accepted_words[index] for index in top.tolist()]
+        if len(mystery_indices) <= CANDIDATE_GUESS_LIMIT:
+            words += [self.config_map.possible_words[index] for index in mystery_indices.tolist()]
+        return list(dict.fromkeys(words))
+
+    def expectedGuessesAfter(self, word: str, mystery_indices: np.ndarray, depth: int) -> float:
+        '''Returns the expected number of guesses to solve the mystery words when 'word' is entered next.'''
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        self.evaluated += 1
+
+        codes = self.config_map.wordRow(word)[mystery_indices]
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+
+        guesses = 1.0
+        for start, part in zip(np.concatenate(([0], bounds)).tolist(), np.split(mystery_indices[order], bounds)):
+            # Entering the mystery word itself ends the game
+            if sorted_codes[start] == self.win_code:
+                continue
+            guesses += len(part) / len(mystery_indices) * self.expectedGuesses(part, depth)
+        return guesses
+
+    def expectedGuesses(self, mystery_indices: np.ndarray, depth: int) -> float:
+        '''Returns the expected number of guesses to solve the mystery words, searching 'depth' more guesses ahead.'''
+        size = len(mystery_indices)
+        if size <= 2 or depth == 0:
+            return estimated_guesses(size)
+
+        key = fingerprint(mystery_indices) + bytes([depth])
+        if key in self.memo:
+            return self.memo[key]
+
+        bits = expected_bits(self.config_map, mystery_indices)
+        guesses = min( self.expectedGuessesAfter(word, mystery_indices, depth - 1)
+                       for word in self.options(mystery_indices, bits, self.inner_breadth) )
+
+        if len(self.memo) >= MAX_MEMO_SIZE:
+            self.memo.clear()
+        self.memo[key] = guesses
+        return guesses
@@ -0,0 +1,241 @@
+
+import time
+import json
+import asyncio
+import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from elements import load_wordlist
+from puzzle import WordlePuzzle
+from dictionary import DictionaryRegistry, DEFAULT_DICTIONARY
+from simulate import NORMAL_MODE, HARD_MODE, MULTI_MODE
+
+DEFAULT_PORT = 8765
+DEFAULT_SESSION_TTL = 600.0
+LATENCY_WINDOW = 1000
+
+class Session():
+    '''A puzzle being solved for a client, driven through its solutionGenerator.'''
+    def __init__(self, session_id: str, wordle_puzzle: WordlePuzzle, mode: str) -> None:
+        self.session_id = session_id
+        self.wordle_puzzle = wordle_puzzle
+        self.mode = mode
+        self.solution_generator = wordle_puzzle.solutionGenerator()
+        self.next_word = None
+        # An error inside the solutionGenerator ends it, after which the session cannot go on
+        self.failed = False
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    def start(self) -> str:
+        return self.advance(None)
+
+    def sendConfiguration(self, config: str) -> str:
+        if self.failed:
+            raise Exception("<Session>: The session failed on an earlier request, create a new one")
+        if self.next_word == "COMPLETED":
+            raise Exception("<Session>: Puzzle is already completed")
+        # Configurations that would make the generator raise are refused before they reach it
+        self.wordle_puzzle.checkConfiguration(self.next_word, config)
+        return self.advance(config)
+
+    def advance(self, config: str) -> str:
+        '''Sends 'config' to the solutionGenerator (starting it if None) and returns the next word.
+        Any error ends the generator, so it marks the session failed; StopIteration is turned into an
+        ordinary Exception, as it cannot be raised through the Future of an executor.'''
+        try:
+            self.next_word = next(self.solution_generator) if config is None else self.solution_generator.send(config)
+        except StopIteration:
+            self.failed = True
+            raise Exception("<Session>: The puzzle has no more words")
+        except Exception:
+            self.failed = True
+            raise
+        return self.next_word
+
+    def state(self) -> dict:
+        return {"session": self.session_id, "mode": self.mode, "word": self.next_word,
+                "complete": self.next_word == "COMPLETED", "failed": self.failed, "steps": self.wordle_puzzle.steps}
+
+class SolverService():
+    '''
+    Serves many concurrent puzzles over line delimited JSON. Puzzles of any word length and dictionary of the
+    DictionaryRegistry are served, and the sessions of a word length share its read-only ConfigMap. The calls that
+    load config maps or search for words run on a pool of worker threads, so that the event loop keeps serving
+    other sessions meanwhile. Each request is a JSON object with an "op":
+        {"op": "create", "mode": "normal" | "hard" | "multi", "games": 2,
+         "length": 5, "dictionary": "default"}                           -> the session and its first word
+        {"op": "feedback", "session": ..., "config": "11233"}            -> the next word, or "COMPLETED"
+        {"op": "next", "session": ...}                                   -> the current word
+        {"op": "close", "session": ...}
+        {"op": "stats"}
+    Sessions that are idle for longer than 'session_ttl' seconds are removed.
+    '''
+    def __init__(self, registry: DictionaryRegistry, workers: int = None, session_ttl: float = DEFAULT_SESSION_TTL) -> None:
+        self.registry = registry
+        self.session_ttl = session_ttl
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.sessions: dict[str, Session] = {}
+        self.session_ids = itertools.count(1)
+        self.start_time = time.monotonic()
+        self.counters = {"requests": 0, "errors": 0, "sessions_created": 0, "sessions_expired": 0, "sessions_completed": 0}
+        self.latencies: dict[str, deque] = {}
+
+    async def handle(self, request: dict) -> dict:
+        '''Handles a single request and returns its response.'''
+        handlers = {"create": self.create, "feedback": self.feedback, "next": self.next,
+                    "close": self.close, "stats": self.stats}
+        op = request.get("op")
+        start = time.perf_counter()
+        self.counters["requests"] += 1
+        try:
+            if op not in handlers:
+                raise Exception(f"<SolverService>: Unknown op {op!r}")
+            response = await handlers[op](request)
+            response["ok"] = True
+        except Exception as exception:
+            self.counters["errors"] += 1
+            response = {"ok": False, "error": str(exception)}
+        if "id" in request:
+            response["id"] = request["id"]
+        latency_key = op if op in handlers else "invalid"
+        self.latencies.setdefault(latency_key, deque(maxlen=LATENCY_WINDOW)).append(time.perf_counter() - start)
+        return response
+
+    def session(self, request: dict) -> Session:
+        session = self.sessions.get(request.get("session"))
+        if session is None:
+            raise Exception("<SolverService>: Unknown or expired session")
+        session.last_used = time.monotonic()
+        return session
+
+    async def create(self, request: dict) -> dict:
+        mode = request.get("mode", NORMAL_MODE)
+        if mode not in (NORMAL_MODE, HARD_MODE, MULTI_MODE):
+            raise Exception(f"<SolverService>: Unknown mode {mode!r}")
+        no_of_games = int(request.get("games", 2)) if mode == MULTI_MODE else 1
+        length = int(request["length"]) if request.get("length") != None else None
+        # The first puzzle of a word length loads its config map
+        wordle_puzzle = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.registry.createPuzzle, mode, length, no_of_games, str(request.get("dictionary", DEFAULT_DICTIONARY)))
+        session_id = str(next(self.session_ids))
+        session = Session(session_id, wordle_puzzle, mode)
+        self.sessions[session_id] = session
+        self.counters["sessions_created"] += 1
+        async with session.lock:
+            await asyncio.get_running_loop().run_in_executor(self.executor, session.start)
+        return session.state()
+
+    async def feedback(self, request: dict) -> dict:
+        session = self.session(request)
+        config = str(request.get("config", ""))
+        async with session.lock:
+            next_word = await asyncio.get_running_loop().run_in_executor(self.executor, session.sendConfiguration, config)
+        if next_word == "COMPLETED":
+            self.counters["sessions_completed"] += 1
+        return session.state()
+
+    async def next(self, request: dict) -> dict:
+        return self.session(request).state()
+
+    async def close(self, request: dict) -> dict:
+        session = self.session(request)
+        del self.sessions[session.session_id]
+        return {"session": session.session_id}
+
+    async def stats(self, _: dict = None) -> dict:
+        uptime = time.monotonic() - self.start_time
+        latency = {}
+        for op, values in self.latencies.items():
+            p50, p95, p99 = np.percentile(list(values), [50, 95, 99])
+            latency[op] = {"count": len(values), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+        return {"uptime": uptime, "active_sessions": len(self.sessions), "throughput": self.counters["requests"] / max(uptime, 1e-9),
+                "latency": latency, **self.counters, "dictionaries": self.registry.stats()}
+
+    def expireSessions(self) -> None:
+        '''Removes the sessions that have been idle for longer than the session TTL.'''
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if now - session.last_used > self.session_ttl and not session.lock.locked():
+                del self.sessions[session_id]
+                self.counters["sessions_expired"] += 1
+
+    async def expireLoop(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.session_ttl / 4, 0.1))
+            self.expireSessions()
+
+    async def serveClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''Answers the requests of a connection, one JSON object per line. Each request is handled as its own task,
+        so a client may pipeline requests for several sessions; responses carry the request "id".'''
+        pending = set()
+        write_lock = asyncio.Lock()
+
+        async def write(response: dict) -> None:
+            async with write_lock:
+                writer.write( (json.dumps(response) + "\n").encode() )
+                await writer.drain()
+
+        async def respond(request: dict) -> None:
+            await write( await self.handle(request) )
+
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request is not an object")
+                except ValueError as exception:
+                    self.counters["requests"] += 1
+                    self.counters["errors"] += 1
+                    await write({"ok": False, "error": f"<SolverService>: Invalid request: {exception}"})
+                    continue
+                task = asyncio.create_task(respond(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> None:
+        server = await asyncio.start_server(self.serveClient, host, port)
+        expire_task = asyncio.create_task(self.expireLoop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            expire_task.cancel()
+            self.executor.shutdown(wait=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the solver to many concurrent puzzles over line delimited JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--session-ttl", type=float, default=DEFAULT_SESSION_TTL)
+    parser.add_argument("--config-map", default=None,
+                        help="config map path of the five letter words of the default dictionary, instead of wordle_data.bin "
+                             "in the cache directory; other lengths are cached beside it")
+    parser.add_argument("--possible", default="wordle_words.txt", help="possible words of the default dictionary, of any lengths")
+    parser.add_argument("--accepted", default="all_words.txt")
+    parser.add_argument("--dictionary", nargs=3, action="append", default=[], metavar=("NAME", "POSSIBLE", "ACCEPTED"),
+                        help="serve another dictionary under NAME")
+    parser.add_argument("--cache-dir", default=".", help="directory of the config maps of every dictionary and word length")
+    parser.add_argument("--memory-cap", type=float, default=None, metavar="MIB",
+                        help="unload idle config maps while the loaded ones take more than this")
+    args = parser.parse_args()
+
+    registry = DictionaryRegistry(args.cache_dir, int(args.memory_cap * 2**20) if args.memory_cap != None else None)
+    registry.register(DEFAULT_DICTIONARY, load_wordlist(args.possible), load_wordlist(args.accepted), args.config_map)
+    for name, possible_path, accepted_path in args.dictionary:
+        registry.register(name, load_wordlist(possible_path), load_wordlist(accepted_path))
+    service = SolverService(registry, args.workers, args.session_ttl)
+    print(f"<SolverService>: Listening on {args.host}:{args.port}")
+    asyncio.run( service.serve(args.host, args.port) )
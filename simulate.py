@@ -0,0 +1,244 @@
+
+import os
+import json
+import time
+import random
+import argparse
+import subprocess
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from elements import Configuration, ConfigMap, load_wordlist
+from puzzle import WordlePuzzle, WordleHardPuzzle, WordleMultiPuzzle
+from search import LookaheadSearch
+from guess_cache import GuessCache
+import metrics
+
+MAX_STEPS = 50
+MAX_GUESSES = 6
+# Worker processes merge new guess cache entries into the shared file this often. Every new entry is also
+# returned with the result of its game, so that the parent process saves the ones found since the last merge.
+GUESS_CACHE_AUTOSAVE = 50
+
+NORMAL_MODE = "normal"
+HARD_MODE = "hard"
+MULTI_MODE = "multi"
+
+def feedback(mystery_words: list[str], my_word: str) -> str:
+    '''Returns the configuration string a puzzle with the given 'mystery_words' shows for 'my_word'.'''
+    return "".join( Configuration(mystery_word, my_word).get_config_string() for mystery_word in mystery_words )
+
+def play_game(wordle_puzzle: WordlePuzzle, mystery_words: list[str], max_steps: int = MAX_STEPS,
+              latencies: list[float] = None) -> list[str]:
+    '''Plays the puzzle against the given 'mystery_words' (one per game), and returns the words it entered.
+    If 'latencies' is given, the time the puzzle took to come up with each word is appended to it.'''
+    entered_words = []
+    start = time.perf_counter()
+    solution_generator = wordle_puzzle.solutionGenerator()
+    next_word = next(solution_generator)
+    while next_word != "COMPLETED":
+        if latencies != None:
+            latencies.append(time.perf_counter() - start)
+        entered_words.append(next_word)
+        if len(entered_words) > max_steps:
+            raise Exception(f"<simulate>: Puzzle did not finish within {max_steps} words")
+        config = feedback(mystery_words, next_word)
+        start = time.perf_counter()
+        next_word = solution_generator.send(config)
+    return entered_words
+
+def create_puzzle(config_map: ConfigMap, word_list: list[str], mode: str, no_of_games: int = 1,
+                  lookahead: LookaheadSearch = None, scorer = None, reducer = None) -> WordlePuzzle:
+    '''Returns a new puzzle of the given 'mode'. The 'lookahead' search is used by single game puzzles,
+    and the 'scorer' (such as a SampledScorer) and 'reducer' (a GuessSpaceReducer of its own) by every puzzle.'''
+    if mode == MULTI_MODE:
+        wordle_puzzle = WordleMultiPuzzle(config_map, word_list, no_of_games)
+    else:
+        wordle_puzzle = WordleHardPuzzle(config_map, word_list) if mode == HARD_MODE else WordlePuzzle(config_map, word_list)
+        wordle_puzzle.lookahead = lookahead
+    wordle_puzzle.scorer = scorer
+    wordle_puzzle.reducer = reducer
+    return wordle_puzzle
+
+def choose_games(word_list: list[str], no_of_games: int = 1, sample: int = None, seed: int = 0) -> list[tuple[str, ...]]:
+    '''Returns the mystery words of every game to play: each word in 'word_list' once, or a 'sample' of them.
+    For more than one game at once, each word is paired with randomly chosen other words.'''
+    generator = random.Random(seed)
+    mystery_words = list(word_list)
+    if sample != None and sample < len(mystery_words):
+        mystery_words = generator.sample(mystery_words, sample)
+    return [ (word, *generator.sample(word_list, no_of_games - 1)) for word in mystery_words ]
+
+# Every worker process loads the config map once; the cache file is memory-mapped, so they share the same pages.
+worker_state = {}
+
+def init_worker(path_to_config: str, possible_word_list: list[str], accepted_word_list: list[str], lookahead_budget: float = None,
+                guess_cache_path: str = None, shared_name: str = None) -> None:
+    if shared_name != None:
+        worker_state["config_map"] = ConfigMap.attach(shared_name)
+    else:
+        worker_state["config_map"] = ConfigMap(path_to_config, possible_word_list, accepted_word_list)
+    worker_state["word_list"] = possible_word_list
+    WordlePuzzle.guess_cache = None
+    if guess_cache_path != None:
+        WordlePuzzle.guess_cache = GuessCache(path=guess_cache_path, autosave=GUESS_CACHE_AUTOSAVE, track_new=True)
+    # The search is shared by every game of the worker, so that they reuse its memoized sets
+    worker_state["lookahead"] = None
+    if lookahead_budget != None:
+        worker_state["lookahead"] = LookaheadSearch(worker_state["config_map"], time_budget=lookahead_budget)
+
+def take_cache_entries(result: dict) -> dict:
+    '''Adds the guess cache entries the worker found since its last result to 'result', and returns it.'''
+    if WordlePuzzle.guess_cache != None:
+        result["cache_entries"] = WordlePuzzle.guess_cache.takeNew()
+    return result
+
+def merge_cache_entries(result: dict) -> dict:
+    '''Moves the guess cache entries of a worker's result into the cache of this process, and returns the result.'''
+    cache_entries = result.pop("cache_entries", None)
+    if cache_entries and WordlePuzzle.guess_cache != None:
+        WordlePuzzle.guess_cache.merge(cache_entries)
+    return result
+
+def run_game(args: tuple) -> dict:
+    '''Plays a single game in a worker process and returns its result.'''
+    mode, mystery_words = args
+    wordle_puzzle = create_puzzle(worker_state["config_map"], worker_state["word_list"], mode, len(mystery_words),
+                                  worker_state["lookahead"])
+    latencies = []
+    if metrics.enabled:
+        metrics.reset()
+    guess_cache = WordlePuzzle.guess_cache
+    cache_lookups = (guess_cache.hits, guess_cache.misses) if guess_cache != None else (0, 0)
+    try:
+        entered_words = play_game(wordle_puzzle, list(mystery_words), latencies=latencies)
+        error = None
+    except Exception as exception:
+        entered_words, error = [], str(exception)
+    result = {"mystery_words": list(mystery_words), "entered_words": entered_words, "latencies": latencies, "error": error}
+    if guess_cache != None:
+        result["cache_hits"] = guess_cache.hits - cache_lookups[0]
+        result["cache_misses"] = guess_cache.misses - cache_lookups[1]
+    if metrics.enabled:
+        result["trace"] = metrics.take_trace()
+        result["metrics"] = metrics.summary()
+    return take_cache_entries(result)
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if len(values) == 0:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(max(values))}
+
+def summarize(results: list[dict], max_guesses: int) -> dict:
+    '''Returns the guess count distribution, failures and per step latency of a set of game results.'''
+    guess_counts = [len(result["entered_words"]) for result in results if result["error"] is None]
+    latencies = [latency for result in results for latency in result["latencies"]]
+    return {
+        "games": len(results),
+        "errors": sum(1 for result in results if result["error"] is not None),
+        "mean_guesses": float(np.mean(guess_counts)) if guess_counts else None,
+        "distribution": {str(count): number for count, number in sorted(Counter(guess_counts).items())},
+        "max_guesses": max_guesses,
+        "failures": sum(1 for count in guess_counts if count > max_guesses),
+        "first_step_latency": percentiles([result["latencies"][0] for result in results if result["latencies"]]),
+        "step_latency": percentiles(latencies),
+        "cache_hits": sum(result.get("cache_hits", 0) for result in results),
+        "cache_misses": sum(result.get("cache_misses", 0) for result in results),
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(path_to_config: str, possible_word_list: list[str], accepted_word_list: list[str], mode: str = NORMAL_MODE,
+                  no_of_games: int = 1, sample: int = None, seed: int = 0, workers: int = None, progress = None,
+                  lookahead_budget: float = None, guess_cache_path: str = None, shared_memory: bool = False) -> dict:
+    '''Plays every chosen game over a pool of 'workers' processes, and returns the summary with every game result.
+    With 'shared_memory', the workers attach to a single copy of the config map published by this process.'''
+    games = [ (mode, mystery_words) for mystery_words in choose_games(possible_word_list, no_of_games, sample, seed) ]
+    init_args = (path_to_config, possible_word_list, accepted_word_list, lookahead_budget, guess_cache_path)
+    # Build the cache once, before the workers race to do it
+    metrics.reset()
+    init_worker(*init_args)
+    load_metrics = metrics.summary()
+
+    start = time.perf_counter()
+    results = []
+    def collect(game_results) -> None:
+        for result in game_results:
+            results.append( merge_cache_entries(result) )
+            if progress != None:
+                progress(len(results), len(games))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        collect( map(run_game, games) )
+    else:
+        config_map = worker_state["config_map"]
+        if shared_memory:
+            init_args += (config_map.publish(),)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=init_args) as executor:
+                collect( executor.map(run_game, games, chunksize=8) )
+        finally:
+            config_map.release()
+    if WordlePuzzle.guess_cache != None:
+        WordlePuzzle.guess_cache.save()
+    wall_time = time.perf_counter() - start
+
+    summary = summarize(results, MAX_GUESSES + no_of_games - 1 if mode == MULTI_MODE else MAX_GUESSES)
+    summary.update({"mode": mode, "no_of_games": no_of_games, "sample": sample, "seed": seed, "workers": workers,
+                    "lookahead_budget": lookahead_budget, "shared_memory": shared_memory,
+                    "wall_time": wall_time, "revision": git_revision()})
+    if metrics.enabled:
+        # Aggregate the metrics of every game, each recorded in the worker that played it
+        metrics.reset()
+        metrics.merge(load_metrics)
+        for result in results:
+            metrics.merge( result.pop("metrics") )
+        summary["metrics"] = metrics.summary()
+    return {"summary": summary, "results": results}
+
+if __name__ == "__main__":
+    from build import ProgressReporter
+
+    parser = argparse.ArgumentParser(description="Plays the solver against every possible word and reports how it did.")
+    parser.add_argument("--mode", choices=[NORMAL_MODE, HARD_MODE, MULTI_MODE], default=NORMAL_MODE)
+    parser.add_argument("--games", type=int, nargs="+", default=[2],
+                        help="number of simultaneous games in multi mode; several numbers run one benchmark each, e.g. 2 4 8")
+    parser.add_argument("--sample", type=int, default=None, help="play a seeded sample of the possible words")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--lookahead", type=float, default=None, metavar="SECONDS",
+                        help="look two guesses ahead, within this time budget per word")
+    parser.add_argument("--guess-cache", default=None, metavar="PATH", help="share the best next words through this file")
+    parser.add_argument("--shared-memory", action="store_true",
+                        help="publish the config map to shared memory once, instead of every worker mapping the cache file")
+    parser.add_argument("--metrics", action="store_true",
+                        help=f"record timers and counters, and a trace of every game (also set by {metrics.METRICS_ENV}=1)")
+    parser.add_argument("--profile", choices=metrics.PROFILE_MODES, default=None,
+                        help=f"profile this process, best with --workers 1 (also set by {metrics.PROFILE_ENV})")
+    parser.add_argument("--config-map", default="wordle_data.bin")
+    parser.add_argument("--possible", default="wordle_words.txt")
+    parser.add_argument("--accepted", default="all_words.txt")
+    parser.add_argument("--output", default=None, help="write the summary and every game to this JSON file")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+
+    benchmarks = []
+    for no_of_games in (args.games if args.mode == MULTI_MODE else [1]):
+        with metrics.profile(args.profile):
+            benchmarks.append( run_benchmark(args.config_map, load_wordlist(args.possible), load_wordlist(args.accepted), args.mode,
+                                             no_of_games, args.sample, args.seed, args.workers,
+                                             ProgressReporter("<simulate>: Playing games", interval=5.0), args.lookahead,
+                                             args.guess_cache, args.shared_memory) )
+        print(json.dumps(benchmarks[-1]["summary"], indent=1))
+    if args.output != None:
+        with open(args.output, "w") as output_file:
+            json.dump(benchmarks[0] if len(benchmarks) == 1 else benchmarks, output_file, indent=1)